@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from typing import Iterator, Optional, Tuple
+
+from . import config
+
+URL_PREFIX = "/artifacts/"
+
+_ID_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def is_valid_id(artifact_id: str) -> bool:
+    return bool(_ID_RE.match(artifact_id))
+
+
+def path_for(artifact_id: str) -> str:
+    if not is_valid_id(artifact_id):
+        raise ValueError(f"Invalid artifact id: {artifact_id}")
+    return os.path.join(config.ARTIFACT_DIR, artifact_id)
+
+
+def media_type_for(artifact_id: str) -> str:
+    return mimetypes.guess_type(artifact_id)[0] or "application/octet-stream"
+
+
+def _refresh(path: str) -> bool:
+    # Restart the expiry of an artifact produced again; False if it is not stored
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def store(data: bytes, ext: str) -> str:
+    """Write data under its content hash and return the artifact id
+
+    Identical content maps to the same id, so repeated results are stored once.
+    """
+    artifact_id = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+    path = path_for(artifact_id)
+    if not _refresh(path):
+        os.makedirs(config.ARTIFACT_DIR, exist_ok=True)
+        # Write to a temp file and rename so readers never see partial artifacts
+        fd, tmp_path = tempfile.mkstemp(dir=config.ARTIFACT_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return artifact_id
+
+
+def store_file(path: str, ext: str) -> str:
+    """Move a finished file into the store under its content hash and return the artifact id
+
+    path must be on the same filesystem as ARTIFACT_DIR.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    artifact_id = f"{digest.hexdigest()}.{ext}"
+    target = path_for(artifact_id)
+    if _refresh(target):
+        os.remove(path)
+    else:
+        os.makedirs(config.ARTIFACT_DIR, exist_ok=True)
+        os.replace(path, target)
+    return artifact_id
+
+
+def remove_expired(now: Optional[float] = None) -> int:
+    """Delete artifacts last produced more than ARTIFACT_TTL seconds ago and return how many"""
+    if not config.ARTIFACT_TTL or not os.path.isdir(config.ARTIFACT_DIR):
+        return 0
+    now = time.time() if now is None else now
+    removed = 0
+    for entry in os.scandir(config.ARTIFACT_DIR):
+        # Temp files of crashed writes expire the same way
+        if not (is_valid_id(entry.name) or entry.name.endswith(".tmp")):
+            continue
+        try:
+            if entry.stat().st_mtime < now - config.ARTIFACT_TTL:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def url_for(artifact_id: str) -> str:
+    return URL_PREFIX + artifact_id
+
+
+def id_from_url(value: str) -> Optional[str]:
+    """Return the artifact id referenced by an artifact URL, or None"""
+    if value.startswith(URL_PREFIX):
+        artifact_id = value[len(URL_PREFIX):]
+        if is_valid_id(artifact_id):
+            return artifact_id
+    return None
+
+
+def encode_result(data: bytes, ext: str, output: str = "base64") -> str:
+    """Return an encoded technique result either inline as base64 or as an artifact URL"""
+    if output == "artifact":
+        return url_for(store(data, ext))
+    return base64.b64encode(data).decode()
+
+
+def encode_file_result(path: str, ext: str, output: str = "base64") -> str:
+    """Like encode_result() for a result written to a file, which is consumed"""
+    if output == "artifact":
+        return url_for(store_file(path, ext))
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return base64.b64encode(data).decode()
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range "bytes=" Range header into inclusive (start, end)
+
+    Returns None when the header should be ignored (other units or multiple
+    ranges) and raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end_s), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def iter_file(path: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yield the inclusive byte range [start, end] of a file in chunks"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,351 @@
+import itertools
+import math
+import os
+import tempfile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from . import artifacts, config, encoders, metrics, spectral
+
+# Source frames decoded per block
+BLOCK_FRAMES = 1 << 16
+
+Blocks = Iterator[np.ndarray]
+
+
+def should_stream(file_path: str) -> bool:
+    """Whether a recording is longer than AUDIO_STREAM_SECONDS and libsndfile can read it"""
+    if not config.AUDIO_STREAM_SECONDS:
+        return False
+    try:
+        info = sf.info(file_path)
+    except sf.LibsndfileError:
+        # Other formats are decoded whole by librosa
+        return False
+    return info.duration > config.AUDIO_STREAM_SECONDS
+
+
+def output_rate(file_path: str) -> int:
+    return config.AUDIO_SAMPLE_RATE or sf.info(file_path).samplerate
+
+
+def _reversed_blocks(f: sf.SoundFile) -> Blocks:
+    # Seek backwards through the file, reversing each block
+    end = f.frames
+    while end > 0:
+        start = max(end - BLOCK_FRAMES, 0)
+        f.seek(start)
+        yield f.read(end - start, dtype='float32', always_2d=True)[::-1]
+        end = start
+
+
+def _mono(block: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(block.mean(axis=1), dtype=np.float32)
+
+
+def read_blocks(file_path: str) -> Blocks:
+    """Yield a recording as mono float32 blocks at output_rate(), as librosa.load() decodes it"""
+    import soxr
+
+    with sf.SoundFile(file_path) as f:
+        sr = config.AUDIO_SAMPLE_RATE or f.samplerate
+        resampler = None
+        if sr != f.samplerate:
+            resampler = soxr.ResampleStream(f.samplerate, sr, 1, dtype='float32', quality='HQ')
+        for block in f.blocks(BLOCK_FRAMES, dtype='float32', always_2d=True):
+            mono = _mono(block)
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono)
+            if len(mono):
+                yield mono
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            if len(tail):
+                yield tail
+
+
+class _Counted:
+    """Iterate over blocks, counting their samples"""
+
+    def __init__(self, blocks: Iterable[np.ndarray]):
+        self._blocks = blocks
+        self.samples = 0
+
+    def __iter__(self) -> Blocks:
+        for block in self._blocks:
+            self.samples += len(block)
+            yield block
+
+
+def _framed(blocks: Iterable[np.ndarray]) -> Blocks:
+    # Yield the stream, padded with N_FFT // 2 zeros at both ends as stft()
+    # pads it, in segments holding a whole number of frames; consecutive
+    # segments overlap by N_FFT - HOP_LENGTH samples
+    n_fft, hop = spectral.N_FFT, spectral.HOP_LENGTH
+    pad = np.zeros(n_fft // 2, dtype=np.float32)
+    buffer = pad
+    for block in itertools.chain(blocks, [pad]):
+        buffer = np.concatenate([buffer, block])
+        if len(buffer) < n_fft:
+            continue
+        n_frames = (len(buffer) - n_fft) // hop + 1
+        yield buffer[:(n_frames - 1) * hop + n_fft]
+        buffer = buffer[n_frames * hop:]
+
+
+def _spectra(blocks: Iterable[np.ndarray]) -> Blocks:
+    for segment in _framed(blocks):
+        yield spectral.analyze(segment)
+
+
+def _synthesize(spectra: Iterable[np.ndarray], length: Callable[[], int]) -> Blocks:
+    # Overlap-add spectra like istft(), yielding samples as soon as no later
+    # frame overlaps them; length() is the output length, known at the end
+    n_fft, hop = spectral.N_FFT, spectral.HOP_LENGTH
+    signal = np.zeros(0, dtype=np.float32)
+    envelope = np.zeros(0, dtype=np.float32)
+    skip = n_fft // 2
+    emitted = 0
+    for spectrum in spectra:
+        n_frames = spectrum.shape[1]
+        if not n_frames:
+            continue
+        size = max((n_frames - 1) * hop + n_fft, len(signal))
+        signal = np.concatenate([signal, np.zeros(size - len(signal), dtype=np.float32)])
+        envelope = np.concatenate([envelope, np.zeros(size - len(envelope), dtype=np.float32)])
+        spectral.overlap_add(spectrum, signal, envelope)
+        # The next frame starts n_frames hops in, so everything before is final
+        done = n_frames * hop
+        out = spectral.normalize_envelope(signal[:done], envelope[:done])[skip:]
+        skip = max(skip - done, 0)
+        signal, envelope = signal[done:], envelope[done:]
+        if len(out):
+            emitted += len(out)
+            yield out
+
+    out = spectral.normalize_envelope(signal, envelope)[skip:]
+    remaining = length() - emitted
+    if remaining > 0:
+        yield np.concatenate([out[:remaining], np.zeros(max(remaining - len(out), 0), dtype=np.float32)])
+
+
+def _fix_length(blocks: Iterable[np.ndarray], length: Callable[[], int], holdback: int = 1 << 14) -> Blocks:
+    # Hold back the last samples until length() is known, then pad or cut the end
+    pending = np.zeros(0, dtype=np.float32)
+    emitted = 0
+    for block in blocks:
+        pending = np.concatenate([pending, block])
+        if len(pending) > holdback:
+            out, pending = pending[:-holdback], pending[-holdback:]
+            emitted += len(out)
+            yield out
+    remaining = length() - emitted
+    if remaining > 0:
+        yield np.concatenate([pending[:remaining], np.zeros(max(remaining - len(pending), 0), dtype=np.float32)])
+
+
+def _vocoded(spectra: Iterable[np.ndarray], rate: float) -> Blocks:
+    # phase_vocoder() on a stream of spectra: only the frames still needed by
+    # upcoming steps are kept
+    buffer = None
+    first = 0
+    step = 0
+    phase = None
+    for spectrum in itertools.chain(spectra, [None]):
+        ended = spectrum is None
+        if not ended:
+            buffer = spectrum if buffer is None else np.concatenate([buffer, spectrum], axis=1)
+        if buffer is None:
+            return
+        if ended:
+            frames = np.pad(buffer, [(0, 0), (0, 2)])
+            limit = first + buffer.shape[1]
+        else:
+            # A step needs the frame after it as well
+            frames = buffer
+            limit = first + buffer.shape[1] - 1
+        # Same step count as np.arange(0, limit, rate)
+        end = max(math.ceil(limit / rate), 0)
+        if end > step:
+            if phase is None:
+                phase = np.angle(frames[:, 0]).astype(np.float64)
+            out, phase = spectral.vocode(frames, np.arange(step, end) * rate - first, phase)
+            step = end
+            yield out
+        if not ended:
+            keep = int(step * rate)
+            buffer = buffer[:, keep - first:]
+            first = keep
+
+
+def normalize(file_path: str) -> Blocks:
+    # Two passes: find the peak, then scale
+    peak = 0.0
+    for block in read_blocks(file_path):
+        peak = max(peak, float(np.abs(block).max()))
+    if peak < np.finfo(np.float32).tiny:
+        peak = 1.0
+    for block in read_blocks(file_path):
+        yield block / np.float32(peak)
+
+
+def trim_silence(file_path: str, top_db: float = 20) -> Blocks:
+    # Like librosa.effects.trim: frames more than top_db below the loudest
+    # one are silent. The first pass keeps one mean square per hop
+    n_fft, hop = spectral.N_FFT, spectral.HOP_LENGTH
+    mse = np.concatenate([
+        np.lib.stride_tricks.sliding_window_view(np.square(segment), n_fft)[::hop].mean(axis=1)
+        for segment in _framed(read_blocks(file_path))
+    ])
+    threshold = 10.0 * np.log10(max(1e-10, float(mse.max()))) - top_db
+    loud = np.flatnonzero(10.0 * np.log10(np.maximum(1e-10, mse)) > threshold)
+    if not loud.size:
+        return
+    start, end = loud[0] * hop, (loud[-1] + 1) * hop
+
+    position = 0
+    for block in read_blocks(file_path):
+        out = block[max(start - position, 0):max(end - position, 0)]
+        position += len(block)
+        if len(out):
+            yield out
+        if position >= end:
+            break
+
+
+def reverse(file_path: str) -> Blocks:
+    # Read back to front by seeking. Resampling a reversed recording does not
+    # give the reversed resampled one, so recordings that need resampling are
+    # first resampled forwards into a scratch file
+    with tempfile.TemporaryDirectory() as scratch:
+        sr = output_rate(file_path)
+        if sr != sf.info(file_path).samplerate:
+            resampled = os.path.join(scratch, "resampled.wav")
+            write(read_blocks(file_path), resampled, sr, subtype='FLOAT')
+            file_path = resampled
+        with sf.SoundFile(file_path) as f:
+            for block in _reversed_blocks(f):
+                yield _mono(block)
+
+
+def noise_reduction(file_path: str, noise_frames: int = 10) -> Blocks:
+    blocks = _Counted(read_blocks(file_path))
+
+    def subtracted() -> Blocks:
+        # spectral_subtraction() with the noise floor estimated once the first
+        # noise_frames frames have arrived
+        pending, noise_mag = [], None
+        for spectrum in itertools.chain(_spectra(blocks), [None]):
+            if noise_mag is None:
+                if spectrum is not None:
+                    pending.append(spectrum)
+                    if sum(s.shape[1] for s in pending) < noise_frames:
+                        continue
+                if not pending:
+                    return
+                head = np.concatenate(pending, axis=1)
+                noise_mag = np.mean(np.abs(head[:, :noise_frames]), axis=1, keepdims=True)
+                batch = pending
+            else:
+                batch = [] if spectrum is None else [spectrum]
+            for s in batch:
+                mag = np.abs(s)
+                yield s * (np.maximum(mag - noise_mag, 0) / np.maximum(mag, np.finfo(np.float32).tiny))
+
+    return _synthesize(subtracted(), lambda: blocks.samples)
+
+
+def time_stretch(file_path: str, rate: float = 1.2) -> Blocks:
+    blocks = _Counted(read_blocks(file_path))
+    return _synthesize(_vocoded(_spectra(blocks), rate), lambda: int(round(blocks.samples / rate)))
+
+
+def pitch_shift(file_path: str, n_steps: float = 2) -> Blocks:
+    # Stretch in time, then resample back to the original duration
+    import soxr
+
+    sr = output_rate(file_path)
+    rate = 2.0 ** (-n_steps / 12)
+    blocks = _Counted(read_blocks(file_path))
+    stretched = _synthesize(_vocoded(_spectra(blocks), rate), lambda: int(round(blocks.samples / rate)))
+    resampler = soxr.ResampleStream(sr / rate, sr, 1, dtype='float32', quality='HQ')
+
+    def resampled() -> Blocks:
+        for block in stretched:
+            yield resampler.resample_chunk(block)
+        yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    return _fix_length(resampled(), lambda: blocks.samples)
+
+
+# Streaming counterparts of the audio processor and augmentor ops
+OPS: Dict[str, Callable[..., Blocks]] = {
+    "normalize": normalize,
+    "noise_reduction": noise_reduction,
+    "trim_silence": trim_silence,
+    "pitch_shift": pitch_shift,
+    "time_stretch": time_stretch,
+    "reverse": reverse
+}
+
+
+def write(
+    blocks: Iterable[np.ndarray],
+    path: str,
+    sr: int,
+    subtype: Optional[str] = None,
+    file_format: str = 'WAV'
+) -> None:
+    """Write blocks to a WAV (or other soundfile format) file as they are produced"""
+    with sf.SoundFile(path, 'w', samplerate=sr, channels=1, format=file_format, subtype=subtype) as f:
+        for block in blocks:
+            f.write(block)
+
+
+def run(
+    file_path: str,
+    techniques: List[str],
+    supported: Iterable[str],
+    output: str = "base64",
+    params: Optional[Dict[str, dict]] = None,
+    codec: Optional[str] = None
+) -> dict:
+    """Apply techniques to a recording block by block, with results shaped like process()/augment()
+
+    Each result is written to disk while it is computed, so memory does not
+    grow with the recording's length; with output="artifact" the file is moved
+    into the artifact store as is. supported lists the techniques the caller
+    accepts; codec must be one that can be written as a stream.
+    """
+    results = {}
+    params = params or {}
+    supported = set(supported)
+
+    try:
+        codec = encoders.audio_codec(codec)
+        file_format, subtype, ext = encoders.audio_format(codec)
+        sr = output_rate(file_path)
+        for technique in techniques:
+            if technique not in supported:
+                raise ValueError(f"Unknown technique: {technique}")
+            os.makedirs(config.ARTIFACT_DIR, exist_ok=True)
+            # Written next to the artifact store, so storing it is a rename
+            fd, tmp_path = tempfile.mkstemp(dir=config.ARTIFACT_DIR, suffix=".tmp")
+            os.close(fd)
+            try:
+                with metrics.span("transform", "audio", technique):
+                    blocks = OPS[technique](file_path, **params.get(technique, {}))
+                    write(blocks, tmp_path, sr, subtype, file_format)
+                metrics.observe(metrics.OUTPUT_BYTES, os.path.getsize(tmp_path), "audio", codec)
+                with metrics.span("serialize", "audio", technique):
+                    results[technique] = artifacts.encode_file_result(tmp_path, ext, output)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    except Exception as e:
+        results["error"] = str(e)
+
+    return results
@@ -1,4 +1,11 @@
-from . import image_augmentor
-from . import text_augmentor
-from . import audio_augmentor
-from . import mesh_augmentor 
\ No newline at end of file
+import importlib
+
+# Submodules pull in heavy per-modality libraries (librosa, trimesh, nltk),
+# so each one is imported on first use
+__all__ = ["image_augmentor", "text_augmentor", "audio_augmentor", "mesh_augmentor"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,36 +1,111 @@
-import librosa
-import soundfile as sf
 import numpy as np
-import base64
-from typing import List
-import io
+from functools import partial
+from typing import Dict, List, Optional
 
-def augment(file_path: str, techniques: List[str]) -> dict:
-    """Apply augmentation techniques to the audio"""
+from .. import audio_stream, encoders, metrics, spectral
+from ..artifacts import encode_result
+from ..decoders import AudioSource, load_audio
+
+def pitch_shift(audio: np.ndarray, sr: int, n_steps: float = 2) -> np.ndarray:
+    # Shift pitch by n_steps semitones
+    return spectral.pitch_shift(audio, sr, n_steps)
+
+def time_stretch(audio: np.ndarray, sr: int, rate: float = 1.2) -> np.ndarray:
+    # Speed up by rate (> 1) or slow down (< 1)
+    return spectral.time_stretch(audio, rate)
+
+def reverse(audio: np.ndarray, sr: int) -> np.ndarray:
+    return audio[::-1]
+
+OPS = {
+    "pitch_shift": pitch_shift,
+    "time_stretch": time_stretch,
+    "reverse": reverse
+}
+TECHNIQUES = tuple(OPS)
+# Techniques whose parameter is drawn per variant by augment_variants():
+# technique -> (parameter, low, high)
+JITTER = {
+    "pitch_shift": ("n_steps", -3.0, 3.0),
+    "time_stretch": ("rate", 0.8, 1.25)
+}
+RANDOM_TECHNIQUES = tuple(JITTER)
+
+def augment(
+    source: AudioSource,
+    techniques: List[str],
+    output: str = "base64",
+    params: Optional[Dict[str, dict]] = None,
+    codec: Optional[str] = None
+) -> dict:
+    """Apply augmentation techniques to an audio file path, encoded bytes or (waveform, sr)
+
+    Results are encoded with codec (see encoders.AUDIO_CODECS).
+    """
     results = {}
+    params = params or {}
+    
+    if isinstance(source, str) and audio_stream.should_stream(source):
+        # Long recordings are processed block by block straight to disk
+        return audio_stream.run(source, techniques, OPS, output, params, codec)
     
     try:
-        audio, sr = librosa.load(file_path)
+        codec = encoders.audio_codec(codec)
+        audio, sr = load_audio(source)
         
+        processed = {}
         for technique in techniques:
-            if technique == "pitch_shift":
-                # Shift pitch up by 2 semitones
-                processed = librosa.effects.pitch_shift(audio, sr=sr, n_steps=2)
-            
-            elif technique == "time_stretch":
-                # Stretch time by 20%
-                processed = librosa.effects.time_stretch(audio, rate=1.2)
-            
-            elif technique == "reverse":
-                processed = audio[::-1]
-            
-            # Save processed audio to buffer
-            buffer = io.BytesIO()
-            sf.write(buffer, processed, sr, format='wav')
-            buffer.seek(0)
-            results[technique] = base64.b64encode(buffer.read()).decode()
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+            with metrics.span("transform", "audio", technique):
+                processed[technique] = OPS[technique](audio, sr, **params.get(technique, {}))
+        
+        # Encode processed audio as base64 or artifact URLs
+        encoded = encoders.encode_all(processed, partial(encoders.encode_audio, sr=sr, codec=codec), "audio")
+        for technique, (data, ext) in encoded.items():
+            with metrics.span("serialize", "audio", technique):
+                results[technique] = encode_result(data, ext, output)
             
     except Exception as e:
         results["error"] = str(e)
     
-    return results 
\ No newline at end of file
+    return results
+
+def augment_variants(
+    source: AudioSource,
+    techniques: List[str],
+    count: int,
+    seed: Optional[int] = None,
+    params: Optional[Dict[str, dict]] = None,
+    codec: Optional[str] = None
+) -> List[Dict[str, bytes]]:
+    """Produce count variants of a recording and return {technique: encoded bytes} for each
+
+    Random techniques draw their parameter per variant from JITTER unless it
+    is given in params; deterministic ones are computed and encoded once and
+    shared by every variant.
+    """
+    params = params or {}
+    audio, sr = load_audio(source)
+    rng = np.random.default_rng(seed)
+
+    variants = [{} for _ in range(count)]
+    for technique in techniques:
+        if technique not in OPS:
+            raise ValueError(f"Unknown technique: {technique}")
+        kwargs = params.get(technique, {})
+        if technique in JITTER and JITTER[technique][0] not in kwargs:
+            name, low, high = JITTER[technique]
+            for variant, value in zip(variants, rng.uniform(low, high, count)):
+                with metrics.span("transform", "audio", technique):
+                    processed = OPS[technique](audio, sr, **{**kwargs, name: float(value)})
+                with metrics.span("encode", "audio", technique):
+                    variant[technique], _ = encoders.encode_audio(processed, sr, codec)
+        else:
+            with metrics.span("transform", "audio", technique):
+                processed = OPS[technique](audio, sr, **kwargs)
+            with metrics.span("encode", "audio", technique):
+                encoded, _ = encoders.encode_audio(processed, sr, codec)
+            for variant in variants:
+                variant[technique] = encoded
+    return variants
@@ -1,40 +1,185 @@
 from PIL import Image, ImageOps
 import numpy as np
-from typing import List
-import base64
-from io import BytesIO
+from typing import Dict, List, Optional
+from functools import partial
 
-def augment(file_path: str, techniques: List[str]) -> dict:
-    """Apply augmentation techniques to the image"""
+from .. import encoders, metrics
+from ..artifacts import encode_result
+from ..decoders import ImageSource, load_image
+
+def flip(img: Image.Image) -> Image.Image:
+    return ImageOps.mirror(img)  # Horizontal flip
+
+def rotate(img: Image.Image, angle: float = 30, expand: bool = True) -> Image.Image:
+    return img.rotate(angle, expand=expand)
+
+def random_variants(
+    img: Image.Image,
+    count: int,
+    rng: Optional[np.random.Generator] = None,
+    flip_p: float = 0.5,
+    max_angle: float = 30,
+    brightness: float = 0.2,
+    contrast: float = 0.2,
+    sigma: float = 10
+) -> np.ndarray:
+    """Return count randomly augmented copies of an image as a (count, H, W, C) uint8 array
+
+    Each variant is flipped horizontally with probability flip_p, rotated by up to
+    max_angle degrees on the same canvas, jittered in brightness and contrast by
+    up to the given fractions and given Gaussian noise of std sigma.
+    """
+    rng = rng or np.random.default_rng()
+    base = np.asarray(img)
+    if base.ndim == 2:
+        base = base[..., np.newaxis]
+    height, width, channels = base.shape
+
+    # All random decisions are drawn up front, one value per variant
+    flips = rng.random(count) < flip_p
+    angles = np.deg2rad(rng.uniform(-max_angle, max_angle, count)).astype(np.float32)
+    gains = rng.uniform(1 - contrast, 1 + contrast, count).astype(np.float32)
+    offsets = (rng.uniform(-brightness, brightness, count) * 255).astype(np.float32)
+
+    if flips.any() or max_angle:
+        # Inverse affine map: the source pixel every output pixel of every variant
+        # samples (nearest neighbour), gathered in one indexing operation
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+        ys -= (height - 1) / 2
+        xs -= (width - 1) / 2
+        cos = np.cos(angles)[:, np.newaxis, np.newaxis]
+        sin = np.sin(angles)[:, np.newaxis, np.newaxis]
+        sign = np.where(flips, -1, 1).astype(np.float32)[:, np.newaxis, np.newaxis]
+        src_x = np.rint(sign * (cos * xs + sin * ys) + (width - 1) / 2).astype(np.int32)
+        src_y = np.rint(cos * ys - sin * xs + (height - 1) / 2).astype(np.int32)
+        outside = (src_x < 0) | (src_x >= width) | (src_y < 0) | (src_y >= height)
+        np.clip(src_x, 0, width - 1, out=src_x)
+        np.clip(src_y, 0, height - 1, out=src_y)
+        batch = base[src_y, src_x].astype(np.float32)
+    else:
+        outside = None
+        batch = np.broadcast_to(base, (count, height, width, channels)).astype(np.float32)
+
+    # Contrast around the image mean, then brightness, in place
+    mean = base.mean(dtype=np.float32)
+    batch *= gains[:, np.newaxis, np.newaxis, np.newaxis]
+    batch += (mean * (1 - gains) + offsets)[:, np.newaxis, np.newaxis, np.newaxis]
+
+    if sigma:
+        # Signed noise, added in float32 before clipping; one buffer serves all variants
+        noise = np.empty(batch.shape[1:], dtype=np.float32)
+        for variant in batch:
+            rng.standard_normal(dtype=np.float32, out=noise)
+            noise *= sigma
+            variant += noise
+
+    # Areas rotated in from outside the image stay black
+    if outside is not None:
+        batch[outside] = 0
+    np.clip(batch, 0, 255, out=batch)
+    return batch.astype(np.uint8)
+
+def noise(img: Image.Image, sigma: float = 25, rng: Optional[np.random.Generator] = None) -> Image.Image:
+    # Add random noise
+    noisy = random_variants(img, 1, rng, flip_p=0, max_angle=0, brightness=0, contrast=0, sigma=sigma)[0]
+    return Image.fromarray(noisy.squeeze(axis=-1) if noisy.shape[-1] == 1 else noisy)
+
+def random_variant(img: Image.Image, rng: Optional[np.random.Generator] = None, **jitter) -> Image.Image:
+    # One variant of random_variants()
+    variant = random_variants(img, 1, rng, **jitter)[0]
+    return Image.fromarray(variant.squeeze(axis=-1) if variant.shape[-1] == 1 else variant)
+
+OPS = {
+    "flip": flip,
+    "rotate": rotate,
+    "noise": noise,
+    "random": random_variant
+}
+TECHNIQUES = tuple(OPS)
+# Techniques that draw random numbers and take the request's generator
+RANDOM_TECHNIQUES = ("noise", "random")
+
+def augment(
+    source: ImageSource,
+    techniques: List[str],
+    output: str = "base64",
+    params: Optional[Dict[str, dict]] = None,
+    seed: Optional[int] = None,
+    codec: Optional[str] = None,
+    quality: Optional[int] = None
+) -> dict:
+    """Apply augmentation techniques to an image file path, encoded bytes or decoded image
+
+    Results are encoded with codec (see encoders.IMAGE_CODECS).
+    """
     results = {}
+    params = params or {}
     try:
-        img = Image.open(file_path)
-        
+        codec = encoders.image_codec(codec)
+        img = load_image(source)
+        rng = np.random.default_rng(seed)
+
         # Convert image to RGB if it's not
         if img.mode != 'RGB':
             img = img.convert('RGB')
-        
+
+        processed = {}
         for technique in techniques:
-            if technique == "flip":
-                processed = ImageOps.mirror(img)  # Horizontal flip
-            
-            elif technique == "rotate":
-                processed = img.rotate(30, expand=True)  # Rotate by 30 degrees
-            
-            elif technique == "noise":
-                # Add random noise
-                img_array = np.array(img)
-                noise = np.random.normal(0, 25, img_array.shape).astype(np.uint8)
-                noisy_array = np.clip(img_array.astype(np.int16) + noise, 0, 255).astype(np.uint8)
-                processed = Image.fromarray(noisy_array)
-            
-            # Convert processed image to base64
-            buffered = BytesIO()
-            processed.save(buffered, format="PNG")
-            buffered.seek(0)
-            results[technique] = base64.b64encode(buffered.getvalue()).decode()
-            
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+            kwargs = params.get(technique, {})
+            if technique in RANDOM_TECHNIQUES:
+                kwargs = {**kwargs, "rng": rng}
+            with metrics.span("transform", "image", technique):
+                processed[technique] = OPS[technique](img, **kwargs)
+
+        # Encode processed images as base64 or artifact URLs
+        encode = partial(encoders.encode_image, codec=codec, quality=quality)
+        for technique, (data, ext) in encoders.encode_all(processed, encode, "image").items():
+            with metrics.span("serialize", "image", technique):
+                results[technique] = encode_result(data, ext, output)
+
     except Exception as e:
         results["error"] = str(e)
-    
-    return results
\ No newline at end of file
+
+    return results
+
+def augment_variants(
+    source: ImageSource,
+    techniques: List[str],
+    count: int,
+    seed: Optional[int] = None,
+    params: Optional[Dict[str, dict]] = None
+) -> List[Dict[str, bytes]]:
+    """Produce count variants of an image and return {technique: PNG bytes} for each
+
+    Random techniques generate all variants in one random_variants() batch;
+    deterministic ones are computed and encoded once and shared by every variant.
+    """
+    params = params or {}
+    img = load_image(source)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    rng = np.random.default_rng(seed)
+
+    variants = [{} for _ in range(count)]
+    for technique in techniques:
+        if technique not in OPS:
+            raise ValueError(f"Unknown technique: {technique}")
+        kwargs = params.get(technique, {})
+        if technique == "noise":
+            kwargs = {"flip_p": 0, "max_angle": 0, "brightness": 0, "contrast": 0, "sigma": 25, **kwargs}
+        if technique in RANDOM_TECHNIQUES:
+            with metrics.span("transform", "image", technique):
+                batch = random_variants(img, count, rng, **kwargs)
+            with metrics.span("encode", "image", technique):
+                for variant, array in zip(variants, batch):
+                    variant[technique], _ = encoders.encode_image(Image.fromarray(array))
+        else:
+            with metrics.span("transform", "image", technique):
+                processed = OPS[technique](img, **kwargs)
+            with metrics.span("encode", "image", technique):
+                encoded, _ = encoders.encode_image(processed)
+            for variant in variants:
+                variant[technique] = encoded
+    return variants
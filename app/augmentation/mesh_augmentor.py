@@ -1,51 +1,132 @@
 import trimesh
 import numpy as np
-from typing import List
-import json
-import os
-
-def augment(file_path: str, techniques: List[str]) -> dict:
-    """Apply augmentation techniques to the 3D mesh"""
-    results = {}
-    
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .. import mesh_codec, mesh_lod, metrics
+from ..decoders import MeshSource, load_mesh_arrays
+
+# Ops take and return (vertices, faces): float32 vertices of shape (V, 3), or a
+# stack of variants of shape (N, V, 3), and int32 faces. They return new arrays
+# and never modify their inputs, so cached arrays can be passed directly
+
+def rotate(
+    vertices: np.ndarray,
+    faces: np.ndarray,
+    angle: float = 45,
+    direction: Sequence[float] = (0, 1, 0),
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Rotate mesh by angle degrees around direction (Y axis by default)
+    rotation = trimesh.transformations.rotation_matrix(
+        angle=np.radians(angle),
+        direction=list(direction)
+    ).astype(np.float32)
+    # Homogeneous 4x4 transform applied as one matrix product
+    return vertices @ rotation[:3, :3].T + rotation[:3, 3], faces
+
+def scale(
+    vertices: np.ndarray,
+    faces: np.ndarray,
+    low: float = 0.8,
+    high: float = 1.2,
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Random non-uniform scaling, drawn per variant
+    rng = rng or np.random.default_rng()
+    factors = rng.uniform(low, high, size=(*vertices.shape[:-2], 1, 3)).astype(np.float32)
+    return vertices * factors, faces
+
+def noise(
+    vertices: np.ndarray,
+    faces: np.ndarray,
+    sigma: float = 0.02,
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Add random vertex displacement
+    rng = rng or np.random.default_rng()
+    displacement = rng.standard_normal(vertices.shape, dtype=np.float32)
+    displacement *= sigma
+    displacement += vertices
+    return displacement, faces
+
+OPS = {
+    "rotate": rotate,
+    "scale": scale,
+    "noise": noise
+}
+TECHNIQUES = tuple(OPS)
+# Techniques that draw random numbers, so each variant differs
+RANDOM_TECHNIQUES = ("scale", "noise")
+
+def _source_arrays(source: MeshSource, max_faces: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    if max_faces and isinstance(source, str):
+        source = mesh_lod.level_for(source, max_faces)
+    return load_mesh_arrays(source)
+
+def augment(
+    source: MeshSource,
+    techniques: List[str],
+    binary: bool = False,
+    params: Optional[Dict[str, dict]] = None,
+    max_faces: Optional[int] = None,
+    seed: Optional[int] = None
+) -> Union[dict, bytes]:
+    """Apply augmentation techniques to the 3D mesh
+
+    source is a file path, a mesh_codec payload or {"vertices", "faces"} JSON
+    as bytes, or a (vertices, faces) tuple. With max_faces, a file is augmented
+    at its nearest LOD level within that face budget.
+
+    With binary=True all results are returned as a single mesh_codec payload
+    keyed by technique; errors are still reported as a dict.
+    """
+    params = params or {}
+
     try:
-        # Force using the appropriate loader based on file extension
-        file_ext = os.path.splitext(file_path)[1].lower()
-        if file_ext == '.off':
-            mesh = trimesh.load_mesh(file_path, file_type='off')
-        else:
-            mesh = trimesh.load(file_path)
-        
+        vertices, faces = _source_arrays(source, max_faces)
+        rng = np.random.default_rng(seed)
+
+        meshes = {}
         for technique in techniques:
-            if technique == "rotate":
-                # Rotate mesh by 45 degrees around Y axis
-                rotation = trimesh.transformations.rotation_matrix(
-                    angle=np.radians(45),
-                    direction=[0, 1, 0]
-                )
-                processed = mesh.copy()
-                processed.apply_transform(rotation)
-            
-            elif technique == "scale":
-                # Random non-uniform scaling
-                scale = np.random.uniform(0.8, 1.2, size=3)
-                processed = mesh.copy()
-                processed.vertices *= scale
-            
-            elif technique == "noise":
-                # Add random vertex displacement
-                processed = mesh.copy()
-                noise = np.random.normal(0, 0.02, size=processed.vertices.shape)
-                processed.vertices += noise
-            
-            # Convert processed mesh to JSON-compatible format
-            result_data = {
-                "vertices": processed.vertices.tolist(),
-                "faces": processed.faces.tolist()
-            }
-            results[technique] = json.dumps(result_data)
-            
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+            with metrics.span("transform", "3d", technique):
+                meshes[technique] = OPS[technique](vertices, faces, rng=rng, **params.get(technique, {}))
+
+        with metrics.span("encode" if binary else "serialize", "3d"):
+            return mesh_codec.encode(meshes, binary)
+
     except Exception as e:
-        results["error"] = str(e)
-    
-    return results
\ No newline at end of file
+        return {"error": str(e)}
+
+def augment_variants(
+    source: MeshSource,
+    techniques: List[str],
+    count: int,
+    seed: Optional[int] = None,
+    params: Optional[Dict[str, dict]] = None
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Produce count variants of a mesh per technique in one stacked computation
+
+    Returns ({technique: (count, V, 3) vertices}, faces); all variants share the
+    faces of the input.
+    """
+    params = params or {}
+    vertices, faces = load_mesh_arrays(source)
+    rng = np.random.default_rng(seed)
+    # A read-only view: no per-variant copy of the input is made
+    stacked = np.broadcast_to(vertices, (count, *vertices.shape))
+
+    variants = {}
+    for technique in techniques:
+        if technique not in OPS:
+            raise ValueError(f"Unknown technique: {technique}")
+        kwargs = params.get(technique, {})
+        with metrics.span("transform", "3d", technique):
+            if technique in RANDOM_TECHNIQUES:
+                variants[technique], _ = OPS[technique](stacked, faces, rng=rng, **kwargs)
+            else:
+                # Deterministic results are computed once and shared by every variant
+                processed, _ = OPS[technique](vertices, faces, rng=rng, **kwargs)
+                variants[technique] = np.broadcast_to(processed, stacked.shape)
+    return variants, faces
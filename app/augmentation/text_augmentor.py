@@ -1,41 +1,148 @@
-import nltk
 from nltk.corpus import wordnet
-import random
-from typing import List
+from nltk.corpus.reader.wordnet import POS_LIST
+import numpy as np
+import os
+import pickle
+import tempfile
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import html
 
-nltk.download('wordnet')
+from .. import config, metrics, nltk_data
+from ..decoders import TextSource, load_text
 
-def augment(file_path: str, techniques: List[str]) -> dict:
-    """Apply augmentation techniques to the text"""
+nltk_data.configure()
+
+# word -> replacements: the first lemma of every synset wordnet.synsets(word) returns
+_synonym_index: Optional[Dict[str, Tuple[str, ...]]] = None
+# Bumped when the index contents change, so stale index files are rebuilt
+_INDEX_VERSION = 2
+
+def _build_synonym_index() -> Dict[str, Tuple[str, ...]]:
+    # (pos, lemma) -> replacements; satellites are adjectives, as in wordnet.synsets()
+    by_pos = defaultdict(list)
+    for synset in wordnet.all_synsets():
+        pos = wordnet.ADJ if synset.pos() == wordnet.ADJ_SAT else synset.pos()
+        replacement = synset.lemmas()[0].name()
+        for name in synset.lemma_names():
+            by_pos[pos, name.lower()].append(replacement)
+    # A lemma can also be an inflected form of another ("saw" of "see",
+    # "running" of "run"), so merge in every form WordNet lemmatizes it to
+    index = {}
+    for name in {name for _, name in by_pos}:
+        index[name] = tuple(
+            replacement
+            for pos in POS_LIST
+            for form in wordnet._morphy(name, pos)
+            for replacement in by_pos.get((pos, form), ())
+        )
+    return index
+
+def _load_synonym_index(path: str) -> Optional[Dict[str, Tuple[str, ...]]]:
+    # None if the file is missing or was built by another version
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        saved = pickle.load(f)
+    if not isinstance(saved, tuple) or saved[0] != _INDEX_VERSION:
+        return None
+    return saved[1]
+
+def _save_synonym_index(index: Dict[str, Tuple[str, ...]], path: str) -> None:
+    # Write atomically, other worker processes may be reading it
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".part")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((_INDEX_VERSION, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def ensure_synonym_index_file() -> None:
+    """Build the synonym index into SYNONYM_INDEX_PATH if it is missing or stale, without keeping it loaded"""
+    path = config.SYNONYM_INDEX_PATH
+    if path and _load_synonym_index(path) is None:
+        _save_synonym_index(_build_synonym_index(), path)
+
+def synonym_index() -> Dict[str, Tuple[str, ...]]:
+    """Return the synonym index, loading it from SYNONYM_INDEX_PATH or building it on first use"""
+    global _synonym_index
+    if _synonym_index is None:
+        path = config.SYNONYM_INDEX_PATH
+        _synonym_index = _load_synonym_index(path) if path else None
+        if _synonym_index is None:
+            _synonym_index = _build_synonym_index()
+            if path:
+                _save_synonym_index(_synonym_index, path)
+    return _synonym_index
+
+@lru_cache(maxsize=65536)
+def _synonyms(word: str) -> Tuple[str, ...]:
+    replacements = synonym_index().get(word.lower())
+    if replacements is None:
+        # Inflected forms that are not lemmas themselves; let WordNet lemmatize them
+        replacements = tuple(syn.lemmas()[0].name() for syn in wordnet.synsets(word))
+    return replacements
+
+def synonym(text: str, p: float = 0.3, rng: Optional[np.random.Generator] = None) -> str:
+    # Replace random words with synonyms; all positions are drawn at once
+    rng = rng or np.random.default_rng()
+    augmented_words = text.split()
+    positions = np.flatnonzero(rng.random(len(augmented_words)) < p)
+    draws = rng.random(len(positions))
+    for i, draw in zip(positions, draws):
+        syns = _synonyms(augmented_words[i])
+        if syns:
+            augmented_words[i] = syns[int(draw * len(syns))]
+    return ' '.join(augmented_words)
+
+def insertion(text: str, p: float = 0.2, rng: Optional[np.random.Generator] = None) -> str:
+    # Insert random words from the text before each word with probability p
+    rng = rng or np.random.default_rng()
+    words = np.array(text.split(), dtype=object)
+    if not len(words):
+        return ''
+    positions = np.flatnonzero(rng.random(len(words)) < p)
+    inserted = words[rng.integers(len(words), size=len(positions))]
+    return ' '.join(np.insert(words, positions, inserted))
+
+OPS = {
+    "synonym": synonym,
+    "insertion": insertion
+}
+TECHNIQUES = tuple(OPS)
+# Techniques that draw random numbers, so each variant differs
+RANDOM_TECHNIQUES = TECHNIQUES
+
+def augment(
+    source: TextSource,
+    techniques: List[str],
+    params: Optional[Dict[str, dict]] = None,
+    seed: Optional[int] = None
+) -> dict:
+    """Apply augmentation techniques to the text of a file path or UTF-8 bytes
+
+    The same seed always gives the same results.
+    """
     results = {}
+    params = params or {}
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            text = file.read()
-        
-        words = text.split()
+        text = load_text(source)
+        rng = np.random.default_rng(seed)
         
         for technique in techniques:
-            if technique == "synonym":
-                # Replace random words with synonyms
-                augmented_words = words.copy()
-                for i in range(len(augmented_words)):
-                    if random.random() < 0.3:  # 30% chance to replace word
-                        syns = wordnet.synsets(augmented_words[i])
-                        if syns:
-                            augmented_words[i] = random.choice(syns).lemmas()[0].name()
-                results[technique] = html.escape(' '.join(augmented_words))
-            
-            elif technique == "insertion":
-                # Insert random words from the text
-                augmented_words = words.copy()
-                for i in range(len(augmented_words)):
-                    if random.random() < 0.2:  # 20% chance to insert word
-                        augmented_words.insert(i, random.choice(words))
-                results[technique] = html.escape(' '.join(augmented_words))
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+            with metrics.span("transform", "text", technique):
+                augmented = OPS[technique](text, rng=rng, **params.get(technique, {}))
+            with metrics.span("serialize", "text", technique):
+                results[technique] = html.escape(augmented)
             
     except Exception as e:
         results["error"] = str(e)
     
-    return results 
\ No newline at end of file
+    return results
@@ -0,0 +1,4 @@
+"""Benchmarks of every technique and endpoint on generated fixtures
+
+Run with `python -m app.benchmark`; see `python -m app.benchmark --help`.
+"""
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.benchmark",
+        description="Time every technique directly and through the API on generated fixtures"
+    )
+    parser.add_argument("--out", default="benchmark.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="results of an earlier run to compare p50 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="slowdown fraction over the baseline reported as a regression (default 0.1)")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case (default 10)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case (default 1)")
+    parser.add_argument("--quick", action="store_true", help="only use the smallest fixture of each kind")
+    parser.add_argument("--suite", choices=("all", "ops", "api"), default="all")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--workdir", default="benchmark_data",
+                        help="fixtures and the app's upload, artifact, job and LOD directories")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    # The app reads its directories and pool kind at import. Running the CPU
+    # pool as threads keeps the work in this process, so peak RSS covers it
+    os.environ.setdefault("CPU_POOL_KIND", "thread")
+    for name in ("UPLOAD_DIR", "ARTIFACT_DIR", "JOB_DIR", "LOD_DIR"):
+        os.environ.setdefault(name, os.path.join(args.workdir, name.lower()[:-4]))
+
+    from . import fixtures, suite
+
+    inputs = fixtures.generate(os.path.join(args.workdir, "fixtures"), quick=args.quick)
+
+    def selected(cases):
+        return ((name, fn) for name, fn in cases if args.filter in name)
+
+    results = {}
+    if args.suite in ("all", "ops"):
+        results.update(suite.run(selected(suite.op_cases(inputs)), args.repeat, args.warmup))
+    if args.suite in ("all", "api"):
+        from starlette.testclient import TestClient
+        from ..main import app
+
+        with TestClient(app) as client:
+            results.update(suite.run(selected(suite.api_cases(client, inputs)), args.repeat, args.warmup))
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": suite.environment(),
+        "settings": {
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "quick": args.quick,
+            "cpu_pool_kind": os.environ["CPU_POOL_KIND"]
+        },
+        "peak_rss_mb": suite.peak_rss_mb(),
+        "cases": results
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = suite.compare(results, baseline["cases"], args.tolerance)
+        regressions = [change for change in report["comparison"] if change["regression"]]
+        for change in regressions:
+            print(
+                f"Regression in {change['case']}: p50 {change['baseline_p50_ms']} -> "
+                f"{change['p50_ms']} ms ({change['change']:+.0%})"
+            )
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    failed = sum("error" in stats for stats in results.values())
+    print(f"{len(results)} cases, {failed} failed, {len(regressions)} regressions; results in {args.out}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import os
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+# (file name, file type, path) of a generated input
+Fixture = Tuple[str, str, str]
+
+# Fixture sizes; quick runs only use the first entry of each
+TEXT_WORDS = (10_000, 100_000)
+CSV_ROWS = (1_000, 10_000)
+IMAGE_SIZES = (256, 1024, 2048)
+AUDIO_SECONDS = (5, 30)
+# Icosphere subdivisions: 1280, 20480 and 81920 faces
+MESH_SUBDIVISIONS = (3, 5, 6)
+
+_AUDIO_RATE = 44100
+_WORDS = (
+    "the quick brown fox jumps over lazy dog data model image sound mesh "
+    "happy small large river city music light night green house train "
+    "fast slow bright dark old new good bad red blue and but or with"
+).split()
+
+
+def _sentences(rng: np.random.Generator, count: int, min_words: int = 5, max_words: int = 20) -> List[str]:
+    lengths = rng.integers(min_words, max_words, size=count)
+    words = rng.choice(_WORDS, size=lengths.sum())
+    ends = rng.choice(['.', '!', '?', ','], size=count)
+    bounds = np.cumsum(lengths)
+    return [
+        ' '.join(words[end - length:end]).capitalize() + mark
+        for end, length, mark in zip(bounds, lengths, ends)
+    ]
+
+
+def _write_text(path: str, rng: np.random.Generator, n_words: int) -> None:
+    # About n_words words, eight sentences per line
+    sentences = _sentences(rng, n_words // 12)
+    with open(path, 'w', encoding='utf-8') as file:
+        for start in range(0, len(sentences), 8):
+            file.write(' '.join(sentences[start:start + 8]) + '\n')
+
+
+def _write_csv(path: str, rng: np.random.Generator, n_rows: int) -> None:
+    import pandas as pd
+
+    pd.DataFrame({
+        "id": np.arange(n_rows),
+        "title": _sentences(rng, n_rows, 2, 8),
+        "review": _sentences(rng, n_rows, 10, 60),
+        "score": rng.random(n_rows).round(3)
+    }).to_csv(path, index=False)
+
+
+def _write_image(path: str, rng: np.random.Generator, size: int) -> None:
+    from PIL import Image
+
+    # Smooth gradients plus noise, so encoded sizes resemble photographs
+    ys, xs = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    channels = [xs, ys, (xs + ys) / 2]
+    img = np.stack([c * 200 + rng.normal(0, 12, (size, size)) for c in channels], axis=-1)
+    Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(path, quality=90)
+
+
+def _write_audio(path: str, rng: np.random.Generator, seconds: int, tone: bool = True) -> None:
+    import soundfile as sf
+
+    t = np.arange(seconds * _AUDIO_RATE, dtype=np.float32) / _AUDIO_RATE
+    audio = rng.normal(0, 0.05, len(t)).astype(np.float32)
+    if tone:
+        # A few harmonics with silence at both ends, so trimming has work to do
+        for harmonic, amplitude in ((220, 0.4), (440, 0.2), (660, 0.1)):
+            audio += amplitude * np.sin(2 * np.pi * harmonic * t)
+        audio[:_AUDIO_RATE // 2] *= 0.01
+        audio[-_AUDIO_RATE // 2:] *= 0.01
+    sf.write(path, audio, _AUDIO_RATE)
+
+
+def _write_noise(path: str, rng: np.random.Generator, seconds: int) -> None:
+    _write_audio(path, rng, seconds, tone=False)
+
+
+def _write_mesh(path: str, rng: np.random.Generator, subdivisions: int) -> None:
+    import trimesh
+
+    trimesh.creation.icosphere(subdivisions=subdivisions).export(path)
+
+
+def generate(directory: str, quick: bool = False, seed: int = 0) -> List[Fixture]:
+    """Write synthetic inputs for every modality to directory and list them
+
+    Files that already exist are reused, so repeated runs time identical inputs.
+    """
+    os.makedirs(directory, exist_ok=True)
+    pick = (lambda sizes: sizes[:1]) if quick else (lambda sizes: sizes)
+
+    specs = []
+    specs += [(f"corpus_{n}.txt", "text", _write_text, n) for n in pick(TEXT_WORDS)]
+    specs += [(f"reviews_{n}.csv", "text", _write_csv, n) for n in pick(CSV_ROWS)]
+    specs += [(f"image_{n}.jpg", "image", _write_image, n) for n in pick(IMAGE_SIZES)]
+    specs.append((f"image_{IMAGE_SIZES[0]}.png", "image", _write_image, IMAGE_SIZES[0]))
+    specs += [(f"tone_{n}s.wav", "audio", _write_audio, n) for n in pick(AUDIO_SECONDS)]
+    specs.append((f"noise_{AUDIO_SECONDS[0]}s.wav", "audio", _write_noise, AUDIO_SECONDS[0]))
+    specs += [(f"icosphere_{n}.ply", "3d", _write_mesh, n) for n in pick(MESH_SUBDIVISIONS)]
+    specs.append((f"icosphere_{MESH_SUBDIVISIONS[0]}.obj", "3d", _write_mesh, MESH_SUBDIVISIONS[0]))
+
+    fixtures = []
+    for name, file_type, write, size in specs:
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            # One generator per file name, so a file's content does not depend
+            # on which of the others are generated
+            write(path, np.random.default_rng([seed, zlib.crc32(name.encode())]), size)
+        fixtures.append((name, file_type, path))
+    return fixtures
@@ -0,0 +1,271 @@
+import platform
+import resource
+import sys
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from .fixtures import Fixture
+
+# Processor and augmentor module of each modality
+_MODULES = {
+    "text": ("text_processor", "text_augmentor"),
+    "image": ("image_processor", "image_augmentor"),
+    "audio": ("audio_processor", "audio_augmentor"),
+    "3d": ("mesh_processor", "mesh_augmentor")
+}
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process so far, in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Time repeat calls of fn after warmup untimed ones"""
+    for _ in range(warmup):
+        fn()
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - start
+
+    times *= 1000
+    # Plain floats, so the results serialize to JSON
+    p50, p90, p99 = np.percentile(times, [50, 90, 99]).tolist()
+    return {
+        "runs": repeat,
+        "mean_ms": round(float(times.mean()), 3),
+        "p50_ms": round(p50, 3),
+        "p90_ms": round(p90, 3),
+        "p99_ms": round(p99, 3),
+        "max_ms": round(float(times.max()), 3),
+        "throughput_per_s": round(repeat * 1000 / float(times.sum()), 3),
+        # A high-water mark, so it covers this case and every one before it
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def _modules(file_type: str) -> List[Tuple[str, Any]]:
+    from .. import augmentation, preprocessing
+
+    processor, augmentor = _MODULES[file_type]
+    return [
+        ("preprocess", getattr(preprocessing, processor)),
+        ("augment", getattr(augmentation, augmentor))
+    ]
+
+
+def _decoded(file_type: str, path: str) -> tuple:
+    # Op arguments before any parameters, as pipeline.run() passes them
+    from ..decoders import load_audio, load_image, load_mesh_arrays
+
+    if file_type == "text":
+        from ..preprocessing import text_processor
+
+        return (text_processor.read_text(path),)
+    if file_type == "image":
+        return (load_image(path),)
+    if file_type == "audio":
+        return load_audio(path)
+    return load_mesh_arrays(path)
+
+
+def op_cases(fixtures: List[Fixture]) -> Iterator[Case]:
+    """Call every technique function on each decoded fixture, without I/O or encoding"""
+    for name, file_type, path in fixtures:
+        args = _decoded(file_type, path)
+        for stage, module in _modules(file_type):
+            for technique, op in module.OPS.items():
+                yield f"ops/{stage}/{file_type}/{name}/{technique}", partial(op, *args)
+
+
+def _check(response) -> None:
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        if isinstance(body, dict) and "error" in body:
+            raise RuntimeError(body["error"])
+
+
+def _request(client, method: str, url: str, **kwargs) -> None:
+    _check(client.request(method, url, **kwargs))
+
+
+def _upload(client, name: str, data: bytes, issued: Dict[str, str]) -> None:
+    from .. import cache
+
+    # Time the preview as for new content, not a re-upload of the same bytes
+    cache.preview_cache.clear()
+    response = client.post("/upload/", files={"file": (name, data)})
+    _check(response)
+    # Later cases refer to the upload by the id the server issued
+    issued[name] = response.json()["filename"]
+
+
+def _request_upload(client, method: str, url: str, issued: Dict[str, str], name: str, **kwargs) -> None:
+    # The id is looked up when the case runs, after the upload case
+    file_id = issued.get(name, name)
+    if "json" in kwargs:
+        kwargs["json"] = {**kwargs["json"], "filename": file_id}
+    _request(client, method, url.replace("{id}", file_id), **kwargs)
+
+
+def _produce_artifact(client, url: str, body: dict, issued: Dict[str, str], name: str, key: str) -> None:
+    response = client.post(url, json={**body, "filename": issued.get(name, name)})
+    _check(response)
+    # Later cases fetch the stored artifact by the URL the server returned
+    issued[key] = next(iter(response.json().values()))
+
+
+def _run_job(client, body: dict, issued: Dict[str, str], name: str, key: str) -> None:
+    response = client.post("/jobs/augment", json={**body, "filenames": [issued.get(name, name)]})
+    _check(response)
+    job_id = response.json()["job_id"]
+    # Time the job until it finishes, as a client polling its status would
+    while True:
+        response = client.get(f"/jobs/{job_id}")
+        _check(response)
+        progress = response.json()
+        if progress["status"] == "completed":
+            break
+        if progress["status"] == "failed":
+            raise RuntimeError(f"Job failed: {progress['errors']}")
+        time.sleep(0.01)
+    issued[key] = progress["download_url"]
+
+
+def _fetch(client, issued: Dict[str, str], key: str) -> None:
+    if key not in issued:
+        raise RuntimeError(f"Nothing to fetch; {key} was not produced")
+    _request(client, "GET", issued[key])
+
+
+def api_cases(client, fixtures: List[Fixture]) -> Iterator[Case]:
+    """Call every endpoint and technique through the app for each fixture
+
+    client is a starlette TestClient, so requests go through routing, request
+    validation, the worker pools and response encoding without a network hop.
+    """
+    issued: Dict[str, str] = {}
+    for name, file_type, path in fixtures:
+        with open(path, 'rb') as f:
+            data = f.read()
+        yield f"api/upload/{file_type}/{name}", partial(_upload, client, name, data, issued)
+        request = partial(_request_upload, client, issued=issued, name=name)
+        if file_type == "3d":
+            yield f"api/preview/3d/{name}", partial(request, "GET", "/preview/3d/{id}")
+
+        for stage, module in _modules(file_type):
+            for technique in module.OPS:
+                body = {"filename": name, "techniques": [technique]}
+                yield (
+                    f"api/{stage}/{file_type}/{name}/{technique}",
+                    partial(request, "POST", f"/{stage}/{file_type}", json=body)
+                )
+
+        # Every output codec, on the first preprocessing technique
+        codecs = {"image": "IMAGE_CODECS", "audio": "AUDIO_CODECS"}.get(file_type)
+        if codecs:
+            from .. import encoders
+
+            technique = next(iter(_modules(file_type)[0][1].OPS))
+            body = {"filename": name, "techniques": [technique]}
+            for codec in getattr(encoders, codecs):
+                yield (
+                    f"api/codec/{file_type}/{name}/{codec}",
+                    partial(request, "POST", f"/preprocess/{file_type}?codec={codec}", json=body)
+                )
+
+        # Every preprocessing op of the modality in one pipeline
+        steps = [{"op": technique} for technique in _modules(file_type)[0][1].OPS]
+        yield (
+            f"api/pipeline/{file_type}/{name}",
+            partial(request, "POST", f"/pipeline/{file_type}", json={"filename": name, "steps": steps})
+        )
+
+        # Store the first preprocessing result as an artifact, then download it
+        if file_type in ("image", "audio"):
+            technique = next(iter(_modules(file_type)[0][1].OPS))
+            key = f"artifact/{name}"
+            yield (
+                f"api/artifact/store/{file_type}/{name}",
+                partial(
+                    _produce_artifact, client, f"/preprocess/{file_type}?output=artifact",
+                    {"techniques": [technique]}, issued, name, key
+                )
+            )
+            yield f"api/artifact/get/{file_type}/{name}", partial(_fetch, client, issued, key)
+
+        # A batch job with the first augmentation technique, then its archive
+        technique = next(iter(_modules(file_type)[1][1].OPS))
+        key = f"job/{name}"
+        body = {"techniques": [technique], "variants": 2, "seed": 0}
+        yield f"api/jobs/augment/{file_type}/{name}", partial(_run_job, client, body, issued, name, key)
+        yield f"api/jobs/download/{file_type}/{name}", partial(_fetch, client, issued, key)
+
+
+def run(cases: Iterator[Case], repeat: int, warmup: int = 1) -> Dict[str, Dict[str, Any]]:
+    """Measure each case, recording {"error": ...} for cases that fail"""
+    results = {}
+    for name, fn in cases:
+        try:
+            results[name] = measure(fn, repeat, warmup)
+            print(f"{name}: p50 {results[name]['p50_ms']} ms")
+        except Exception as e:
+            # Collapse multi-line messages such as NLTK's missing-resource banner
+            message = ' '.join(str(e).replace('*', '').split())
+            results[name] = {"error": message}
+            print(f"Error in benchmark {name}: {message}")
+    return results
+
+
+def environment() -> Dict[str, str]:
+    import numpy
+    import PIL
+    import librosa
+    import trimesh
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": numpy.__version__,
+        "pillow": PIL.__version__,
+        "librosa": librosa.__version__,
+        "trimesh": trimesh.__version__
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float = 0.1
+) -> List[Dict[str, Any]]:
+    """Compare the p50 latency of the cases both runs measured
+
+    Returns one entry per common case; "regression" is set when the case got
+    slower by more than the tolerance fraction.
+    """
+    changes = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if not before or "p50_ms" not in stats or "p50_ms" not in before:
+            continue
+        change = (stats["p50_ms"] - before["p50_ms"]) / max(before["p50_ms"], 1e-6)
+        changes.append({
+            "case": name,
+            "baseline_p50_ms": before["p50_ms"],
+            "p50_ms": stats["p50_ms"],
+            "change": round(change, 3),
+            "regression": change > tolerance
+        })
+    return changes
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import numpy as np
+
+from . import config, metrics
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def _sizeof(value: Any) -> int:
+    """Rough in-memory size of a decoded asset in bytes"""
+    # Mapped pages belong to the OS page cache, shared between processes
+    if isinstance(value, np.memmap):
+        return sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_sizeof(item) for item in value.values())
+    # PIL images, without importing PIL here
+    if hasattr(value, "getbands") and hasattr(value, "size"):
+        width, height = value.size
+        return width * height * len(value.getbands())
+    return sys.getsizeof(value)
+
+
+class AssetCache:
+    """Thread-safe LRU cache of decoded assets bounded by a memory budget
+
+    Hits, misses, evictions and the cache's size are reported as metrics,
+    which reach the parent process from pool workers like spans do.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+    def _report_size(self) -> None:
+        pid = str(os.getpid())
+        metrics.observe(metrics.CACHE_ENTRIES, len(self._entries), self.name, pid)
+        metrics.observe(metrics.CACHE_BYTES, self.current_bytes, self.name, pid)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics.observe(metrics.CACHE_EVENTS, 1, self.name, "miss" if entry is None else "hit")
+        return None if entry is None else entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = _sizeof(value)
+        # Items larger than the whole budget would only flush everything else
+        if size > self.max_bytes:
+            return
+        evictions = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                evictions += 1
+            self._report_size()
+        if evictions:
+            metrics.observe(metrics.CACHE_EVENTS, evictions, self.name, "eviction")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self._report_size()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the entries, size and hit counts of this cache over every process
+
+        Call in the parent process, which receives the workers' metrics.
+        """
+        sizes = {
+            metric: sum(value for (name, _), value in gauge.values().items() if name == self.name)
+            for metric, gauge in (("entries", metrics.CACHE_ENTRIES), ("bytes", metrics.CACHE_BYTES))
+        }
+        hits, misses, evictions = (
+            int(metrics.CACHE_EVENTS.value(self.name, event)) for event in ("hit", "miss", "eviction")
+        )
+        lookups = hits + misses
+        return {
+            "processes": sum(1 for name, _ in metrics.CACHE_BYTES.values() if name == self.name),
+            "entries": int(sizes["entries"]),
+            "bytes": int(sizes["bytes"]),
+            "max_bytes_per_process": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+
+asset_cache = AssetCache("asset", config.CACHE_MAX_BYTES)
+# Upload previews keyed by content hash, so re-uploads skip preview generation
+preview_cache = AssetCache("preview", config.PREVIEW_CACHE_BYTES)
+
+# file path -> (size, mtime_ns, sha256) so unchanged files are not re-hashed
+_digests: Dict[str, Tuple[int, int, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content, as indexed for uploads"""
+    st = os.stat(file_path)
+    with _digests_lock:
+        known = _digests.get(file_path)
+    if known is not None and known[:2] == (st.st_size, st.st_mtime_ns):
+        return known[2]
+
+    # Uploads were hashed while being stored; imported here as uploads uses this module
+    from .uploads import indexed_digest
+    hexdigest = indexed_digest(file_path)
+    if hexdigest is None:
+        digest = hashlib.sha256()
+        with metrics.span("read"), open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        hexdigest = digest.hexdigest()
+    with _digests_lock:
+        _digests[file_path] = (st.st_size, st.st_mtime_ns, hexdigest)
+    return hexdigest
+
+
+def forget_digest(file_path: str) -> None:
+    """Drop the remembered digest of a deleted file"""
+    with _digests_lock:
+        _digests.pop(file_path, None)
+
+
+def get_or_load_bytes(data: bytes, kind: str, loader: Callable[[bytes], Any]) -> Any:
+    """Like get_or_load() for inputs that are already in memory"""
+    key = (hashlib.sha256(data).hexdigest(), kind)
+    value = asset_cache.get(key)
+    if value is None:
+        value = loader(data)
+        asset_cache.put(key, value)
+    return value
+
+
+def get_or_load(file_path: str, kind: str, loader: Callable[[str], Any]) -> Any:
+    """Return the decoded asset for file_path, decoding it with loader on a miss
+
+    Cached values are shared between callers and must not be modified in place.
+    """
+    key = (file_digest(file_path), kind)
+    value = asset_cache.get(key)
+    if value is None:
+        value = loader(file_path)
+        asset_cache.put(key, value)
+    return value
+
+
+def stats() -> Dict[str, Any]:
+    return asset_cache.stats()
@@ -0,0 +1,71 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = _env_int("MAX_UPLOAD_BYTES", 1024 * 1024 * 1024)
+# SQLite index of uploads, shared by every worker process on the host
+UPLOAD_INDEX_PATH = os.environ.get("UPLOAD_INDEX_PATH", os.path.join(UPLOAD_DIR, "index.sqlite3"))
+# Uploads unused for this long are deleted; 0 keeps them
+UPLOAD_TTL = _env_float("UPLOAD_TTL", 7 * 24 * 3600.0)
+# Least recently used uploads are deleted while the store is larger; 0 disables the quota
+UPLOAD_QUOTA_BYTES = _env_int("UPLOAD_QUOTA_BYTES", 10 * 1024 * 1024 * 1024)
+# Seconds between eviction runs; 0 disables the background task
+UPLOAD_EVICT_INTERVAL = _env_float("UPLOAD_EVICT_INTERVAL", 300.0)
+
+# Execution layer: CPU-bound work goes to a process pool, blocking I/O to a thread pool
+CPU_WORKERS = _env_int("CPU_WORKERS", os.cpu_count() or 1)
+IO_WORKERS = _env_int("IO_WORKERS", 8)
+# "process" or "thread"; threads are handy for debugging and single-core hosts
+CPU_POOL_KIND = os.environ.get("CPU_POOL_KIND", "process")
+# Tasks allowed to be running or queued per pool before requests get a 503
+MAX_PENDING_TASKS = _env_int("MAX_PENDING_TASKS", 4 * CPU_WORKERS)
+TASK_TIMEOUT = _env_float("TASK_TIMEOUT", 120.0)
+RETRY_AFTER = _env_int("RETRY_AFTER", 5)
+
+# Memory budget of the per-process decoded-asset cache
+CACHE_MAX_BYTES = _env_int("CACHE_MAX_BYTES", 512 * 1024 * 1024)
+PREVIEW_CACHE_BYTES = _env_int("PREVIEW_CACHE_BYTES", 64 * 1024 * 1024)
+# Larger meshes are decimated for the upload preview
+PREVIEW_MAX_FACES = _env_int("PREVIEW_MAX_FACES", 100000)
+# Precomputed mesh LOD pyramids, keyed by content hash
+LOD_DIR = os.environ.get("LOD_DIR", "lod")
+
+# Rate audio is resampled to on load; 0 keeps each file's native rate
+AUDIO_SAMPLE_RATE = _env_int("AUDIO_SAMPLE_RATE", 22050)
+# Longer recordings are processed block by block with bounded memory; 0 never streams
+AUDIO_STREAM_SECONDS = _env_float("AUDIO_STREAM_SECONDS", 600.0)
+
+# Threads per process encoding the results of multi-technique requests; 1 encodes in turn
+ENCODE_THREADS = _env_int("ENCODE_THREADS", 4)
+
+# Content-addressed store for encoded results served from /artifacts/
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "artifacts")
+# Artifacts not produced again for this many seconds are deleted; 0 keeps them
+ARTIFACT_TTL = _env_float("ARTIFACT_TTL", 24 * 3600.0)
+
+# Working directories and outputs of batch augmentation jobs
+JOB_DIR = os.environ.get("JOB_DIR", "jobs")
+# Finished jobs and their outputs are deleted after this many seconds; 0 keeps them
+JOB_TTL = _env_float("JOB_TTL", 24 * 3600.0)
+# Limits on the supported members of a zip archive extracted for a job
+MAX_ARCHIVE_MEMBERS = _env_int("MAX_ARCHIVE_MEMBERS", 100000)
+MAX_ARCHIVE_BYTES = _env_int("MAX_ARCHIVE_BYTES", 4 * MAX_UPLOAD_BYTES)
+
+# Serialized WordNet synonym index, built on first use if missing; empty disables the file
+SYNONYM_INDEX_PATH = os.environ.get("SYNONYM_INDEX_PATH", "synonym_index.pickle")
+
+# Checked before NLTK's default locations; fill it with `python -m app.nltk_data`
+NLTK_DATA_DIR = os.environ.get("NLTK_DATA_DIR", "nltk_data")
+
+# Import every modality and preload corpora in each worker at startup
+WARMUP = _env_int("WARMUP", 0) == 1
@@ -0,0 +1,160 @@
+import io
+import json
+import os
+from functools import partial
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+import numpy as np
+
+from . import config, mesh_codec, mesh_store, metrics
+from .cache import get_or_load, get_or_load_bytes
+
+# Decoding libraries are imported by the loaders that need them, so importing
+# one modality does not pull in the others
+if TYPE_CHECKING:
+    import trimesh
+    from PIL import Image
+
+# Processors and augmentors take either a file path or an in-memory input:
+# encoded file bytes, or an already decoded value for the modality
+AudioSource = Union[str, bytes, Tuple[np.ndarray, int]]
+ImageSource = Union[str, bytes, "Image.Image", np.ndarray]
+MeshSource = Union[str, bytes, "trimesh.Trimesh", Tuple[np.ndarray, np.ndarray]]
+TextSource = Union[str, bytes]
+
+
+def _decode_audio(source: Union[str, bytes]) -> Tuple[np.ndarray, int]:
+    import librosa
+
+    with metrics.span("decode", "audio"):
+        audio, sr = librosa.load(
+            io.BytesIO(source) if isinstance(source, bytes) else source,
+            sr=config.AUDIO_SAMPLE_RATE or None
+        )
+    audio.flags.writeable = False
+    return audio, sr
+
+
+def _decode_image(source: Union[str, bytes], size: Optional[Tuple[int, int]] = None) -> "Image.Image":
+    from PIL import Image
+
+    with metrics.span("decode", "image"):
+        img = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        if size:
+            # JPEG decodes straight to the smallest DCT scale covering size; other
+            # formats are reduced by an integer factor after decoding
+            img.draft(None, size)
+            img.load()
+            factor = min(img.width // size[0], img.height // size[1])
+            if factor > 1:
+                img = img.reduce(factor)
+        img.load()
+    return img
+
+
+def _mesh_arrays(vertices, faces) -> Tuple[np.ndarray, np.ndarray]:
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    faces = np.ascontiguousarray(faces, dtype=np.int32)
+    vertices.flags.writeable = False
+    faces.flags.writeable = False
+    return vertices, faces
+
+
+def _decode_mesh(file_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    import trimesh
+
+    # Files are parsed once; later loads memory-map the stored arrays
+    stored = mesh_store.load(file_path)
+    if stored is not None:
+        return stored
+
+    # Force using the appropriate loader based on file extension
+    file_ext = os.path.splitext(file_path)[1].lower()
+    with metrics.span("decode", "3d"):
+        if file_ext == '.off':
+            mesh = trimesh.load_mesh(file_path, file_type='off')
+        else:
+            mesh = trimesh.load(file_path)
+    return mesh_store.save(file_path, mesh) or _mesh_arrays(mesh.vertices, mesh.faces)
+
+
+def _decode_mesh_bytes(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    # In-memory meshes arrive as a mesh_codec payload or {"vertices", "faces"} JSON
+    with metrics.span("decode", "3d"):
+        if mesh_codec.is_packed(data):
+            meshes, _ = mesh_codec.unpack(data)
+            vertices, faces = next(iter(meshes.values()))
+        else:
+            mesh_data = json.loads(data)
+            vertices, faces = mesh_data['vertices'], mesh_data['faces']
+        return _mesh_arrays(vertices, faces)
+
+
+def load_audio(source: AudioSource) -> Tuple[np.ndarray, int]:
+    """Return the (read-only) waveform and sample rate of an audio input"""
+    if isinstance(source, tuple):
+        return source
+    if isinstance(source, bytes):
+        return get_or_load_bytes(source, "audio", _decode_audio)
+    with metrics.labels("audio"):
+        return get_or_load(source, "audio", _decode_audio)
+
+
+def load_image(source: ImageSource, size: Optional[Tuple[int, int]] = None) -> "Image.Image":
+    """Return the decoded image; callers must not modify it in place
+
+    With size, encoded inputs may be decoded at a reduced resolution that is
+    still at least size in both dimensions.
+    """
+    from PIL import Image
+
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, np.ndarray):
+        return Image.fromarray(source)
+    kind = f"image@{size[0]}x{size[1]}" if size else "image"
+    loader = partial(_decode_image, size=size)
+    if isinstance(source, bytes):
+        return get_or_load_bytes(source, kind, loader)
+    with metrics.labels("image"):
+        return get_or_load(source, kind, loader)
+
+
+def load_mesh_arrays(source: MeshSource) -> Tuple[np.ndarray, np.ndarray]:
+    """Return float32 vertices and int32 faces of a mesh input
+
+    Arrays of encoded inputs come from the cache and are read-only; those of
+    mesh files are memory-mapped from the mesh_store.
+    """
+    import trimesh
+
+    if isinstance(source, trimesh.Trimesh):
+        source = (source.vertices, source.faces)
+    if isinstance(source, tuple):
+        return (
+            np.asarray(source[0], dtype=np.float32),
+            np.asarray(source[1], dtype=np.int32)
+        )
+    if isinstance(source, bytes):
+        return get_or_load_bytes(source, "mesh", _decode_mesh_bytes)
+    with metrics.labels("3d"):
+        return get_or_load(source, "mesh", _decode_mesh)
+
+
+def load_mesh(source: MeshSource) -> "trimesh.Trimesh":
+    """Return a mesh built from the cached vertex and face arrays"""
+    import trimesh
+
+    if isinstance(source, trimesh.Trimesh):
+        return source
+    vertices, faces = load_mesh_arrays(source)
+    return trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+
+
+def load_text(source: TextSource) -> str:
+    """Return the raw text of a file path or of UTF-8 encoded bytes"""
+    if isinstance(source, bytes):
+        with metrics.span("decode", "text"):
+            return source.decode('utf-8')
+    with metrics.span("read", "text"), open(source, 'r', encoding='utf-8') as file:
+        return file.read()
@@ -0,0 +1,128 @@
+import contextvars
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from . import config, metrics
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Output codecs, the first of each being the default. quality is the PNG
+# compress_level (0-9) or the JPEG/WebP quality (1-100); audio codecs ignore it
+IMAGE_CODECS = ("png", "jpeg", "webp", "npy")
+AUDIO_CODECS = ("wav", "flac", "npy")
+
+# Audio codec -> (soundfile format, subtype, file extension)
+_AUDIO_FORMATS = {
+    "wav": ("WAV", "PCM_16", "wav"),
+    "flac": ("FLAC", "PCM_16", "flac")
+}
+
+# (encoded bytes, file extension)
+Encoded = Tuple[bytes, str]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def image_codec(codec: Optional[str]) -> str:
+    """Return the image codec to use for a requested one, rejecting unknown codecs"""
+    codec = codec or IMAGE_CODECS[0]
+    if codec not in IMAGE_CODECS:
+        raise ValueError(f"Unknown image codec: {codec}")
+    return codec
+
+
+def audio_codec(codec: Optional[str]) -> str:
+    """Return the audio codec to use for a requested one, rejecting unknown codecs"""
+    codec = codec or AUDIO_CODECS[0]
+    if codec not in AUDIO_CODECS:
+        raise ValueError(f"Unknown audio codec: {codec}")
+    return codec
+
+
+def audio_format(codec: Optional[str]) -> Tuple[str, str, str]:
+    """Return the soundfile (format, subtype, extension) of a codec written as a stream"""
+    codec = audio_codec(codec)
+    if codec not in _AUDIO_FORMATS:
+        raise ValueError(f"Codec {codec} cannot be written as a stream")
+    return _AUDIO_FORMATS[codec]
+
+
+def _npy(array: np.ndarray) -> bytes:
+    buffered = io.BytesIO()
+    np.save(buffered, array)
+    return buffered.getvalue()
+
+
+def encode_image(img: "Image.Image", codec: Optional[str] = None, quality: Optional[int] = None) -> Encoded:
+    codec = image_codec(codec)
+    if codec == "npy":
+        data, ext = _npy(np.asarray(img)), "npy"
+    else:
+        buffered = io.BytesIO()
+        if codec == "png":
+            # Pillow's default compress_level is 6; lower levels are much faster
+            options = {} if quality is None else {"compress_level": quality}
+            img.save(buffered, format="PNG", **options)
+            ext = "png"
+        else:
+            # Neither codec stores palettes or 16-bit channels, and JPEG has no alpha
+            keep = ("RGB", "L") if codec == "jpeg" else ("RGB", "RGBA", "L")
+            if img.mode not in keep:
+                img = img.convert("RGBA" if codec == "webp" and "A" in img.getbands() else "RGB")
+            default_quality = 85 if codec == "jpeg" else 80
+            img.save(buffered, format=codec.upper(), quality=default_quality if quality is None else quality)
+            ext = "jpg" if codec == "jpeg" else "webp"
+        data = buffered.getvalue()
+    metrics.observe(metrics.OUTPUT_BYTES, len(data), "image", codec)
+    return data, ext
+
+
+def encode_audio(audio: np.ndarray, sr: int, codec: Optional[str] = None, quality: Optional[int] = None) -> Encoded:
+    import soundfile as sf
+
+    codec = audio_codec(codec)
+    if codec == "npy":
+        # Float samples as computed; the rate is up to the caller
+        data, ext = _npy(audio), "npy"
+    else:
+        file_format, subtype, ext = _AUDIO_FORMATS[codec]
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, sr, format=file_format, subtype=subtype)
+        data = buffer.getvalue()
+    metrics.observe(metrics.OUTPUT_BYTES, len(data), "audio", codec)
+    return data, ext
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.ENCODE_THREADS, thread_name_prefix="encode")
+        return _executor
+
+
+def encode_all(results: Dict[str, Any], encode: Callable[[Any], Encoded], modality: str) -> Dict[str, Encoded]:
+    """Encode {technique: result} with encode, returning {technique: (bytes, extension)}
+
+    Several results are encoded in parallel on a thread pool; Pillow and
+    libsndfile release the GIL while compressing.
+    """
+    def encode_one(technique: str, result: Any) -> Encoded:
+        with metrics.span("encode", modality, technique):
+            return encode(result)
+
+    if len(results) < 2 or config.ENCODE_THREADS < 2:
+        return {technique: encode_one(technique, result) for technique, result in results.items()}
+    # Each thread runs in a copy of this context, so its spans reach the same
+    # collected observations or request breakdown
+    futures = {
+        technique: _get_executor().submit(contextvars.copy_context().run, encode_one, technique, result)
+        for technique, result in results.items()
+    }
+    return {technique: future.result() for technique, future in futures.items()}
@@ -0,0 +1,109 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from . import config, metrics, warmup
+
+
+class PoolBusyError(Exception):
+    """Raised when a pool already has the maximum number of pending tasks"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy, try again later")
+        self.retry_after = retry_after
+
+
+class TaskTimeoutError(Exception):
+    """Raised when a task does not finish within its timeout"""
+
+
+class _BoundedPool:
+    """Executor wrapper that caps the number of running + queued tasks"""
+
+    def __init__(self, name: str, factory: Callable[[], Executor], max_pending: int):
+        self.name = name
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._factory()
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        with self._lock:
+            if self._pending >= self._max_pending:
+                raise PoolBusyError(config.RETRY_AFTER)
+            self._pending += 1
+
+        try:
+            # Spans and other observations made by the task come back with its result
+            future = self._get_executor().submit(metrics.collect, fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is freed when the work actually finishes, not when the caller
+        # stops waiting, so timed-out tasks still count against the limit
+        future.add_done_callback(self._release)
+
+        timeout = config.TASK_TIMEOUT if timeout is None else timeout
+        try:
+            # A timeout of 0 waits for as long as the task takes
+            result, observations = await asyncio.wait_for(asyncio.wrap_future(future), timeout or None)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise TaskTimeoutError(f"{self.name} task timed out after {timeout:g}s")
+        metrics.record_all(observations)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _make_cpu_executor() -> Executor:
+    if config.CPU_POOL_KIND == "thread":
+        return ThreadPoolExecutor(max_workers=config.CPU_WORKERS, thread_name_prefix="cpu")
+    # spawn avoids forking a process that already runs the event loop and I/O threads
+    return ProcessPoolExecutor(
+        max_workers=config.CPU_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warmup.warm_up if config.WARMUP else None
+    )
+
+
+def _make_io_executor() -> Executor:
+    return ThreadPoolExecutor(max_workers=config.IO_WORKERS, thread_name_prefix="io")
+
+
+cpu_pool = _BoundedPool("cpu", _make_cpu_executor, config.MAX_PENDING_TASKS)
+io_pool = _BoundedPool("io", _make_io_executor, config.MAX_PENDING_TASKS)
+
+
+async def run_cpu(fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """Run a CPU-bound function in the process pool, for up to timeout (default TASK_TIMEOUT) seconds"""
+    return await cpu_pool.run(fn, *args, timeout=timeout, **kwargs)
+
+
+async def run_io(fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """Run a blocking I/O function in the thread pool"""
+    return await io_pool.run(fn, *args, timeout=timeout, **kwargs)
+
+
+def shutdown() -> None:
+    cpu_pool.shutdown()
+    io_pool.shutdown()
@@ -0,0 +1,461 @@
+import asyncio
+import html
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tarfile
+import tempfile
+import time
+import uuid
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+from . import config, uploads
+from .executor import PoolBusyError, run_cpu, run_io
+
+OUTPUT_KINDS = ("zip", "tar", "directory")
+# Image and mesh variants generated per worker call
+IMAGE_BATCH_SIZE = 8
+MESH_BATCH_SIZE = 8
+
+
+def augment_item(
+    file_path: str,
+    file_type: str,
+    techniques: List[str],
+    seed: int,
+    variants: int = 1,
+    deterministic: bool = True
+) -> List[Dict[str, Tuple[str, bytes]]]:
+    """Produce variants of an input and return {technique: (ext, file bytes)} for each
+
+    Runs in a worker process; the seed makes each variant reproducible.
+    Deterministic techniques give the same output for every variant, so it is
+    only returned with the first variant, and only if deterministic is set.
+    """
+    from .augmentation import audio_augmentor, image_augmentor, mesh_augmentor, text_augmentor
+
+    augmentor = {
+        "text": text_augmentor,
+        "image": image_augmentor,
+        "audio": audio_augmentor,
+        "3d": mesh_augmentor
+    }.get(file_type)
+    if augmentor is None:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    # A job can mix modalities, so only apply the techniques this one supports
+    techniques = [
+        t for t in techniques
+        if t in augmentor.TECHNIQUES and (deterministic or t in augmentor.RANDOM_TECHNIQUES)
+    ]
+    if not techniques:
+        return [{} for _ in range(variants)]
+
+    if file_type == "image":
+        # All image variants come out of one batched call
+        items = [
+            {technique: ("png", data) for technique, data in variant.items()}
+            for variant in image_augmentor.augment_variants(file_path, techniques, variants, seed=seed)
+        ]
+    elif file_type == "3d":
+        # Mesh variants are computed as one stacked array per technique
+        import trimesh
+
+        stacked, faces = mesh_augmentor.augment_variants(file_path, techniques, variants, seed=seed)
+        items = [
+            {
+                technique: ("ply", trimesh.Trimesh(
+                    vertices=vertices[variant], faces=faces, process=False
+                ).export(file_type='ply'))
+                for technique, vertices in stacked.items()
+                if variant == 0 or technique in augmentor.RANDOM_TECHNIQUES
+            }
+            for variant in range(variants)
+        ]
+    elif file_type == "audio":
+        # Pitch and stretch amounts are drawn per variant
+        items = [
+            {technique: ("wav", data) for technique, data in variant.items()}
+            for variant in audio_augmentor.augment_variants(file_path, techniques, variants, seed=seed)
+        ]
+    else:
+        items = []
+        for variant in range(variants):
+            results = text_augmentor.augment(file_path, techniques, seed=seed + variant)
+            if "error" in results:
+                raise RuntimeError(results["error"])
+            items.append({
+                technique: ("txt", html.unescape(text).encode('utf-8'))
+                for technique, text in results.items()
+            })
+
+    for outputs in items[1:]:
+        for technique in techniques:
+            if technique not in augmentor.RANDOM_TECHNIQUES:
+                outputs.pop(technique, None)
+    return items
+
+
+def list_archive(file_path: str) -> str:
+    """Return a preview listing the supported members of a zip archive"""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = [
+                info.filename for info in archive.infolist()
+                if not info.is_dir() and uploads.file_type_for(info.filename)
+            ]
+        return f"{len(names)} supported files\n" + "\n".join(names[:100])
+    except Exception as e:
+        return f"Error reading archive: {str(e)}"
+
+
+def _extract_archive(archive_path: str, dest_dir: str) -> List[str]:
+    """Extract supported members of a zip archive into dest_dir and return their paths
+
+    Archives with more than MAX_ARCHIVE_MEMBERS supported members or
+    MAX_ARCHIVE_BYTES uncompressed are rejected before anything is written.
+    """
+    paths = []
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [
+            (index, info) for index, info in enumerate(archive.infolist())
+            if not info.is_dir() and uploads.file_type_for(info.filename)
+        ]
+        if len(members) > config.MAX_ARCHIVE_MEMBERS:
+            raise ValueError(f"Archive has more than {config.MAX_ARCHIVE_MEMBERS} supported files")
+        # zipfile stops reading a member at its declared size, so the sum bounds what is written
+        if sum(info.file_size for _, info in members) > config.MAX_ARCHIVE_BYTES:
+            raise ValueError(f"Archive expands to more than {config.MAX_ARCHIVE_BYTES} bytes")
+        os.makedirs(dest_dir, exist_ok=True)
+        for index, info in members:
+            # Flatten member paths so archives cannot write outside dest_dir
+            name = f"{index:06d}_{os.path.basename(info.filename)}"
+            path = os.path.join(dest_dir, name)
+            with archive.open(info) as src, open(path, "wb") as dst:
+                while True:
+                    chunk = src.read(1 << 20)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            paths.append(path)
+    return paths
+
+
+class _ZipWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, name: str, data: bytes) -> None:
+        # PNG and FLAC/WAV gain little from deflate, so store media uncompressed
+        compress = zipfile.ZIP_DEFLATED if name.endswith((".txt", ".ply")) else zipfile.ZIP_STORED
+        self._archive.writestr(name, data, compress_type=compress)
+
+    def close(self) -> None:
+        self._archive.close()
+
+
+class _TarWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._archive = tarfile.open(path, "w")
+
+    def add(self, name: str, data: bytes) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._archive.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        self._archive.close()
+
+
+class _ShardWriter:
+    """Writes results into numbered shard directories of at most shard_size files"""
+
+    def __init__(self, path: str, shard_size: int):
+        self.path = path
+        self._shard_size = shard_size
+        self._count = 0
+
+    def add(self, name: str, data: bytes) -> None:
+        shard_dir = os.path.join(self.path, f"shard-{self._count // self._shard_size:05d}")
+        dest = os.path.join(shard_dir, name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "wb") as f:
+            f.write(data)
+        self._count += 1
+
+    def close(self) -> None:
+        pass
+
+
+class Job:
+    """State and progress of one batch augmentation job
+
+    The state is kept in a file in the job directory, so every worker can
+    report on a job whichever one runs it, and it survives restarts.
+    """
+
+    def __init__(self, inputs: List[str], techniques: List[str], variants: int,
+                 output: str, seed: Optional[int], shard_size: int):
+        self.id = uuid.uuid4().hex
+        self.inputs = inputs
+        self.techniques = techniques
+        self.variants = variants
+        self.output = output
+        self.seed = random.randrange(2**31) if seed is None else seed
+        self.shard_size = shard_size
+        self.dir = os.path.join(config.JOB_DIR, self.id)
+        self.status = "queued"
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.output_path: Optional[str] = None
+        # When the running process last saved the state
+        self.updated_at = time.time()
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Job":
+        job = cls(state["inputs"], state["techniques"], state["variants"],
+                  state["output"], state["seed"], state["shard_size"])
+        job.id = state["id"]
+        job.dir = os.path.join(config.JOB_DIR, job.id)
+        for name in _STATE_FIELDS:
+            setattr(job, name, state[name])
+        return job
+
+    def state(self) -> dict:
+        return {
+            "id": self.id,
+            "inputs": self.inputs,
+            "techniques": self.techniques,
+            "variants": self.variants,
+            "output": self.output,
+            "seed": self.seed,
+            "shard_size": self.shard_size,
+            **{name: getattr(self, name) for name in _STATE_FIELDS},
+            "errors": self.errors[-10:]
+        }
+
+    def progress(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        done = self.completed + self.failed
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed": round(elapsed, 3),
+            "items_per_second": round(done / elapsed, 3) if elapsed > 0 else 0.0,
+            "seed": self.seed,
+            "errors": self.errors[-10:],
+            "download_url": f"/jobs/{self.id}/download"
+                if self.status == "completed" and self.output != "directory" else None
+        }
+
+
+_STATE_FIELDS = ("status", "total", "completed", "failed", "errors",
+                 "started_at", "finished_at", "output_path", "updated_at")
+_STATE_FILE = "job.json"
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+# Running jobs save their state at most this often, and at least every
+# TOUCH_INTERVAL; jobs not saved for _STALE_AFTER lost their process
+_SAVE_INTERVAL = 0.5
+_STALE_AFTER = 3 * uploads.TOUCH_INTERVAL
+
+# Tasks of the jobs this process runs, referenced so they are not garbage collected
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _save(job: Job) -> None:
+    # Written aside and renamed into place, so readers never see a partial state
+    job.updated_at = time.time()
+    fd, tmp_path = tempfile.mkstemp(dir=job.dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(job.state(), f)
+        os.replace(tmp_path, os.path.join(job.dir, _STATE_FILE))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _load(job_dir: str, now: float) -> Optional[Job]:
+    try:
+        with open(os.path.join(job_dir, _STATE_FILE)) as f:
+            job = Job.from_state(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+    if job.finished_at is None and job.updated_at < now - _STALE_AFTER:
+        # Its process stopped, e.g. in a restart, before the job finished
+        job.status = "failed"
+        job.errors.append("Job was interrupted")
+        job.finished_at = job.updated_at
+    return job
+
+
+def get(job_id: str) -> Optional[Job]:
+    """Return the current state of a job run by any worker, or None if it is unknown"""
+    if not _ID_RE.match(job_id):
+        return None
+    return _load(os.path.join(config.JOB_DIR, job_id), time.time())
+
+
+def _modified_since(path: str, since: float) -> bool:
+    # Whether anything under path was written after since
+    for root, dirs, files in os.walk(path):
+        for name in [root, *(os.path.join(root, name) for name in dirs + files)]:
+            try:
+                if os.stat(name).st_mtime >= since:
+                    return True
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def prune(now: Optional[float] = None) -> int:
+    """Delete jobs finished more than JOB_TTL seconds ago, and return how many
+
+    Jobs whose process stopped count as finished when they last saved their
+    state. Directories without a readable state, e.g. from crashed
+    submissions, go once nothing in them has changed for JOB_TTL.
+    """
+    if not config.JOB_TTL or not os.path.isdir(config.JOB_DIR):
+        return 0
+    now = time.time() if now is None else now
+    removed = 0
+    for entry in os.scandir(config.JOB_DIR):
+        if not entry.is_dir():
+            continue
+        job = _load(entry.path, now)
+        if job is None:
+            expired = not _modified_since(entry.path, now - config.JOB_TTL)
+        else:
+            expired = job.finished_at is not None and job.finished_at < now - config.JOB_TTL
+        if expired:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def submit(inputs: List[str], techniques: List[str], variants: int = 1, output: str = "zip",
+           seed: Optional[int] = None, shard_size: int = 1000) -> Job:
+    """Create a job and start running it in the background"""
+    if output not in OUTPUT_KINDS:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_KINDS)}")
+    if variants < 1:
+        raise ValueError("variants must be at least 1")
+    job = Job(inputs, techniques, variants, output, seed, max(shard_size, 1))
+    os.makedirs(job.dir, exist_ok=True)
+    _save(job)
+    task = asyncio.create_task(_run(job))
+    _tasks[job.id] = task
+    task.add_done_callback(lambda _: _tasks.pop(job.id, None))
+    return job
+
+
+async def _run_item(job: Job, path: str, file_type: str, seed: int, first: int, count: int):
+    # Wait for room in the pool instead of failing the whole job
+    while True:
+        try:
+            return await run_cpu(augment_item, path, file_type, job.techniques, seed, count, first == 0)
+        except PoolBusyError as e:
+            await asyncio.sleep(min(e.retry_after, 1))
+
+
+async def _keep_alive(job: Job) -> None:
+    # Jobs can outlive TASK_TIMEOUT, after which eviction would no longer treat
+    # their uploads as in use; the saved state shows the job is still running
+    while True:
+        await asyncio.sleep(uploads.TOUCH_INTERVAL)
+        try:
+            await run_io(uploads.touch, job.inputs)
+            _save(job)
+        except Exception as e:
+            print(f"Error keeping job alive: {str(e)}")
+
+
+async def _run(job: Job) -> None:
+    job.status = "running"
+    job.started_at = time.time()
+    writer = None
+    keep_alive = asyncio.create_task(_keep_alive(job))
+    try:
+        await run_io(uploads.touch, job.inputs)
+        _save(job)
+
+        # Expand zip archives into their supported members
+        files = []
+        for path in job.inputs:
+            if path.lower().endswith(".zip"):
+                extract_dir = os.path.join(job.dir, "inputs", str(len(files)))
+                files.extend(await run_io(_extract_archive, path, extract_dir))
+            else:
+                files.append(path)
+
+        # Each item covers a run of variants: a batch for images and meshes, one otherwise
+        items = []
+        for index, path in enumerate(files):
+            file_type = uploads.file_type_for(path)
+            batch = {"image": IMAGE_BATCH_SIZE, "3d": MESH_BATCH_SIZE}.get(file_type, 1)
+            for first in range(0, job.variants, batch):
+                # Seeds depend on the input and variant number, not on the batching
+                seed = job.seed + index * job.variants + first
+                items.append((path, file_type, seed, first, min(batch, job.variants - first)))
+        job.total = len(files) * job.variants
+        _save(job)
+
+        if job.output == "zip":
+            writer = _ZipWriter(os.path.join(job.dir, "results.zip"))
+        elif job.output == "tar":
+            writer = _TarWriter(os.path.join(job.dir, "results.tar"))
+        else:
+            writer = _ShardWriter(os.path.join(job.dir, "results"), job.shard_size)
+        job.output_path = writer.path
+        write_lock = asyncio.Lock()
+        # Keep enough items in flight to occupy every worker without flooding the queue
+        slots = asyncio.Semaphore(config.CPU_WORKERS)
+
+        async def process(path: str, file_type: str, seed: int, first: int, count: int) -> None:
+            async with slots:
+                try:
+                    variants = await _run_item(job, path, file_type, seed, first, count)
+                    stem = os.path.splitext(os.path.basename(path))[0]
+                    async with write_lock:
+                        for variant, outputs in enumerate(variants, first):
+                            for technique, (ext, data) in outputs.items():
+                                name = f"{stem}/{technique}_{variant:04d}.{ext}"
+                                await run_io(writer.add, name, data)
+                    job.completed += count
+                except Exception as e:
+                    job.failed += count
+                    job.errors.append(f"{os.path.basename(path)} #{first}: {str(e)}")
+                if time.time() - job.updated_at >= _SAVE_INTERVAL:
+                    _save(job)
+
+        await asyncio.gather(*(process(*item) for item in items))
+        await run_io(writer.close)
+        writer = None
+        job.status = "completed" if job.completed or not job.total else "failed"
+    except Exception as e:
+        job.status = "failed"
+        job.errors.append(str(e))
+    finally:
+        keep_alive.cancel()
+        if writer is not None:
+            writer.close()
+        job.finished_at = time.time()
+        try:
+            _save(job)
+        except OSError as e:
+            print(f"Error saving job state: {str(e)}")
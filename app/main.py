@@ -1,35 +1,145 @@
-from fastapi import FastAPI, UploadFile, File, Request
+import time
+
+# Startup is timed from the first import of this module
+_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Request, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, FileResponse, StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 import os
-from typing import List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional
 import base64
-from io import BytesIO
 import json
+from urllib.parse import unquote
 
 # Update imports to use relative imports
-from .preprocessing import (
-    text_processor,
-    image_processor,
-    audio_processor,
-    mesh_processor
-)
-from .augmentation import (
-    text_augmentor,
-    image_augmentor,
-    audio_augmentor,
-    mesh_augmentor
+# Processor and augmentor modules are imported on first use, see their packages
+from . import (
+    artifacts, augmentation, cache, config, executor, jobs, mesh_codec, mesh_lod, metrics, pipeline,
+    preprocessing, uploads, warmup
 )
+from .executor import run_cpu, run_io, PoolBusyError, TaskTimeoutError
+from .uploads import UploadTooLargeError
 
 # Update Pydantic model to handle all types of preprocessed data
 class PreprocessRequest(BaseModel):
     filename: str
     techniques: List[str]
     preprocessed_result: Optional[str] = None
+    # Per-technique keyword arguments, e.g. {"rotate": {"angle": 15}}
+    params: Optional[Dict[str, Dict[str, Any]]] = None
+    # CSV columns to process; defaults to every text column
+    columns: Optional[List[str]] = None
+    # Makes text, image and 3D augmentation reproducible
+    seed: Optional[int] = None
+
+class PipelineStep(BaseModel):
+    op: str
+    params: Dict[str, Any] = {}
+
+class PipelineRequest(BaseModel):
+    filename: str
+    steps: List[PipelineStep]
+
+# Slack for multipart boundaries and headers around the file body
+_MULTIPART_OVERHEAD = 64 * 1024
+
+class BatchAugmentRequest(BaseModel):
+    filenames: List[str]
+    techniques: List[str]
+    variants: int = 1
+    output: str = "zip"
+    seed: Optional[int] = None
+    shard_size: int = 1000
+
+# Seconds spent importing, warming up and until the app is ready to serve
+startup_stats: Dict[str, float] = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_stats["import_seconds"] = round(time.perf_counter() - _STARTED, 3)
+    if config.WARMUP:
+        # Process workers warm up in their initializer; only a thread pool
+        # runs the work in this process, so only then does it need warming
+        if config.CPU_POOL_KIND == "thread":
+            startup_stats["warmup_seconds"] = round(await asyncio.to_thread(warmup.warm_up), 3)
+        else:
+            # Files the workers load, such as the synonym index, are built here
+            # once rather than by every worker at the same time
+            prepared = time.perf_counter()
+            await asyncio.to_thread(warmup.prepare)
+            startup_stats["prepare_seconds"] = round(time.perf_counter() - prepared, 3)
+        # Start every worker now; each runs the warm-up initializer before its
+        # first task, which may take longer than TASK_TIMEOUT on a cold start
+        workers_started = time.perf_counter()
+        try:
+            await asyncio.gather(*(run_cpu(os.getpid, timeout=0) for _ in range(config.CPU_WORKERS)))
+        except Exception as e:
+            print(f"Error warming up workers: {str(e)}")
+        startup_stats["worker_warmup_seconds"] = round(time.perf_counter() - workers_started, 3)
+    startup_stats["startup_seconds"] = round(time.perf_counter() - _STARTED, 3)
+    print(f"Startup took {startup_stats['startup_seconds']}s")
+    for phase, seconds in startup_stats.items():
+        metrics.STARTUP_SECONDS.set(seconds, phase[:-len("_seconds")])
+    eviction = None
+    if config.UPLOAD_EVICT_INTERVAL:
+        eviction = asyncio.create_task(_evict_files())
+    yield
+    if eviction is not None:
+        eviction.cancel()
+    executor.shutdown()
+
+app = FastAPI(title="Data Processing & Augmentation API", lifespan=lifespan)
+
+@app.exception_handler(PoolBusyError)
+async def pool_busy_handler(request: Request, exc: PoolBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_handler(request: Request, exc: UploadTooLargeError):
+    return JSONResponse(status_code=413, content={"error": str(exc)})
 
-app = FastAPI(title="Data Processing & Augmentation API")
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Refuse declared oversized bodies before the multipart parser spools them;
+    # the limit is enforced again while streaming for chunked uploads
+    if request.url.path == "/upload/":
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > config.MAX_UPLOAD_BYTES + _MULTIPART_OVERHEAD:
+            return JSONResponse(
+                status_code=413,
+                content={"error": f"Upload exceeds the {config.MAX_UPLOAD_BYTES} byte limit"}
+            )
+    return await call_next(request)
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    # Requests sent with "X-Profile: 1" get their time per stage back in a
+    # Server-Timing header, including the stages run in worker processes
+    started = time.perf_counter()
+    with metrics.breakdown() as stages:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    # Label by route template, not the raw path, so file names don't add series
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(
+        elapsed, request.method, route.path if route else "unmatched", str(response.status_code)
+    )
+    if request.headers.get("x-profile") == "1":
+        response.headers["Server-Timing"] = metrics.server_timing(stages, elapsed)
+    return response
+
+@app.exception_handler(TaskTimeoutError)
+async def task_timeout_handler(request: Request, exc: TaskTimeoutError):
+    return JSONResponse(status_code=504, content={"error": str(exc)})
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -38,60 +148,238 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
 # Create upload directory if it doesn't exist
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = config.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+def _mesh_response(result):
+    # Binary mesh results are bytes; errors stay JSON
+    if isinstance(result, bytes):
+        return Response(content=result, media_type=mesh_codec.MEDIA_TYPE)
+    return result
+
+async def _evict_files() -> None:
+    # Every worker runs this loop; uploads.evict() lets one of them at a time do the work
+    while True:
+        try:
+            counts = await run_io(uploads.evict)
+            counts["artifacts"] = await run_io(artifacts.remove_expired)
+            counts["jobs"] = await run_io(jobs.prune)
+            if any(counts.values()):
+                print(f"Evicted files: {counts}")
+        except Exception as e:
+            print(f"Error evicting files: {str(e)}")
+        await asyncio.sleep(config.UPLOAD_EVICT_INTERVAL)
+
+async def _upload_path(filename: str) -> Optional[str]:
+    """Return the path of an upload by the id it was issued, or None if unknown"""
+    return await run_io(uploads.resolve, filename)
+
+def _unknown_file(filename: str) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"error": f"Unknown file: {filename}"})
+
+# Fire-and-forget tasks, referenced here so they are not garbage collected
+_background_tasks = set()
+
+def _start_background(coro, description: str) -> None:
+    async def run():
+        try:
+            await coro
+        except Exception as e:
+            print(f"Error in background {description}: {str(e)}")
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def _preprocessed_source(file_type: str, preprocessed_result: str):
+    """Turn a preprocessed result sent back by the client into an augmentor input"""
+    artifact_id = artifacts.id_from_url(preprocessed_result)
+    if artifact_id:
+        return artifacts.path_for(artifact_id)
+    if file_type == "text":
+        # Text results are sent URL-encoded
+        return unquote(preprocessed_result).encode('utf-8')
+    if file_type == "3d":
+        decoded_data = unquote(preprocessed_result)
+        if decoded_data.lstrip().startswith('{'):
+            return decoded_data.encode('utf-8')
+        # Binary clients send a base64 encoded mesh_codec payload
+        return base64.b64decode(decoded_data)
+    return base64.b64decode(preprocessed_result)
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/startup/stats")
+async def get_startup_stats():
+    return startup_stats
+
+@app.get("/metrics")
+async def get_metrics():
+    # Stage and request latency histograms in the Prometheus text format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    # Decoding happens in the worker pool; every worker's cache metrics reach
+    # this process with its task results and are summed here
+    return cache.stats()
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    if not artifacts.is_valid_id(artifact_id):
+        return JSONResponse(status_code=404, content={"error": "Artifact not found"})
+    path = artifacts.path_for(artifact_id)
+    if not os.path.exists(path):
+        return JSONResponse(status_code=404, content={"error": "Artifact not found"})
+    
+    # Artifacts are content-addressed, so the id doubles as a strong ETag
+    etag = '"' + artifact_id.split('.')[0] + '"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    media_type = artifacts.media_type_for(artifact_id)
+    range_header = request.headers.get("range")
+    if range_header:
+        size = os.path.getsize(path)
+        try:
+            byte_range = artifacts.parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                artifacts.iter_file(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+    
+    return FileResponse(path, media_type=media_type, headers=headers)
+
 @app.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    file: UploadFile = File(...),
+    response_format: str = Query("json", alias="format")
+):
     file_ext = file.filename.split('.')[-1].lower()
     
-    # Save the uploaded file
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-    
-    # Determine file type and return appropriate preview
-    if file_ext in ['txt', 'csv']:
-        preview = text_processor.get_preview(file_path)
-        file_type = "text"
-    elif file_ext in ['jpg', 'jpeg', 'png']:
-        preview = image_processor.get_preview(file_path)
-        file_type = "image"
-    elif file_ext in ['wav', 'mp3']:
-        preview = audio_processor.get_preview(file_path)
-        file_type = "audio"
-    elif file_ext in ['obj', 'stl', 'off', 'ply']:
-        preview = mesh_processor.get_preview(file_path)
-        file_type = "3d"
+    # Determine file type and the matching previewer
+    file_type = uploads.file_type_for(file.filename)
+    if file_type == "text":
+        get_preview = preprocessing.text_processor.get_preview
+    elif file_type == "image":
+        get_preview = preprocessing.image_processor.get_preview
+    elif file_type == "audio":
+        get_preview = preprocessing.audio_processor.get_preview
+    elif file_type == "3d":
+        get_preview = preprocessing.mesh_processor.get_preview
+    elif file_ext == "zip":
+        # Archives are inputs for batch jobs; the preview lists their members
+        file_type, get_preview = "archive", jobs.list_archive
     else:
         return {"error": "Unsupported file type"}
     
-    return {
-        "filename": file.filename,
+    # Stream the uploaded file to disk under a new id, hashing it on the way.
+    # Later requests refer to the upload by that id, returned as "filename"
+    filename, digest, file_path = await run_io(uploads.store_upload, file.file, file.filename, file_type)
+    
+    response = {
+        "filename": filename,
+        "original_filename": os.path.basename(file.filename),
         "file_type": file_type,
-        "preview": preview
+        "sha256": digest
     }
+    if file_type == "3d":
+        _start_background(run_cpu(mesh_lod.build_pyramid, file_path), "LOD pyramid")
+    if file_type == "3d" and response_format == "binary":
+        # Binary clients fetch the geometry separately from preview_url
+        response["preview_url"] = f"/preview/3d/{filename}?format=binary"
+        return response
+    
+    # Identical bytes produce the same preview, so re-uploads reuse it
+    preview_key = (digest, file_ext)
+    preview = cache.preview_cache.get(preview_key)
+    if preview is None:
+        preview = await run_cpu(get_preview, file_path)
+        cache.preview_cache.put(preview_key, preview)
+    response["preview"] = preview
+    return response
+
+@app.get("/uploads/{filename}")
+async def upload_info(filename: str):
+    record = await run_io(uploads.info, filename)
+    if record is None:
+        return _unknown_file(filename)
+    return record
+
+@app.delete("/uploads/{filename}")
+async def delete_upload(filename: str):
+    if not await run_io(uploads.delete, filename):
+        return _unknown_file(filename)
+    return {"deleted": filename}
+
+@app.get("/preview/3d/{filename}")
+async def mesh_preview(
+    filename: str,
+    response_format: str = Query("json", alias="format"),
+    max_faces: Optional[int] = None
+):
+    file_path = await _upload_path(filename)
+    if file_path is None:
+        return _unknown_file(filename)
+    
+    # Cached by content hash, like upload previews
+    binary = response_format == "binary"
+    preview_key = (await run_io(cache.file_digest, file_path), "3d", binary, max_faces)
+    preview = cache.preview_cache.get(preview_key)
+    if preview is None:
+        preview = await run_cpu(preprocessing.mesh_processor.get_preview, file_path, binary, max_faces)
+        cache.preview_cache.put(preview_key, preview)
+    if isinstance(preview, bytes):
+        return _mesh_response(preview)
+    return {"preview": preview}
 
 @app.post("/preprocess/{file_type}")
 async def preprocess_file(
     file_type: str,
-    request: PreprocessRequest
+    request: PreprocessRequest,
+    response_format: str = Query("json", alias="format"),
+    output: str = "base64",
+    codec: Optional[str] = None,
+    quality: Optional[int] = None
 ):
-    file_path = os.path.join(UPLOAD_DIR, request.filename)
+    file_path = await _upload_path(request.filename)
+    if file_path is None:
+        return _unknown_file(request.filename)
     
     if file_type == "text":
-        result = text_processor.process(file_path, request.techniques)
+        result = await run_cpu(
+            preprocessing.text_processor.process, file_path, request.techniques,
+            params=request.params, columns=request.columns
+        )
     elif file_type == "image":
-        result = image_processor.process(file_path, request.techniques)
+        result = await run_cpu(
+            preprocessing.image_processor.process, file_path, request.techniques, output,
+            params=request.params, codec=codec, quality=quality
+        )
     elif file_type == "audio":
-        result = audio_processor.process(file_path, request.techniques)
+        result = await run_cpu(
+            preprocessing.audio_processor.process, file_path, request.techniques, output,
+            params=request.params, codec=codec
+        )
     elif file_type == "3d":
-        result = mesh_processor.process(file_path, request.techniques)
+        binary = response_format == "binary"
+        result = _mesh_response(
+            await run_cpu(preprocessing.mesh_processor.process, file_path, request.techniques, binary, params=request.params)
+        )
     else:
         return {"error": "Unsupported file type"}
     
@@ -100,95 +388,138 @@ async def preprocess_file(
 @app.post("/augment/{file_type}")
 async def augment_file(
     file_type: str,
-    request: PreprocessRequest
+    request: PreprocessRequest,
+    response_format: str = Query("json", alias="format"),
+    output: str = "base64",
+    max_faces: Optional[int] = None,
+    codec: Optional[str] = None,
+    quality: Optional[int] = None
 ):
     try:
+        # Preprocessed results are augmented straight from memory or from the
+        # artifact store; otherwise use the original file
         if request.preprocessed_result:
-            # Handle preprocessed data based on file type
-            if file_type == "text":
-                # Create temporary file with preprocessed text
-                temp_path = os.path.join(UPLOAD_DIR, "temp_preprocessed.txt")
-                decoded_text = request.preprocessed_result
-                try:
-                    # Try to decode URL-encoded text
-                    from urllib.parse import unquote
-                    decoded_text = unquote(request.preprocessed_result)
-                except:
-                    pass
-                
-                with open(temp_path, "w", encoding='utf-8') as f:
-                    f.write(decoded_text)
-                result = text_augmentor.augment(temp_path, request.techniques)
-                os.remove(temp_path)  # Clean up
-                return result
-                
-            elif file_type == "image":
-                # Convert base64 to image
-                image_data = base64.b64decode(request.preprocessed_result)
-                temp_path = os.path.join(UPLOAD_DIR, "temp_preprocessed.png")
-                with open(temp_path, "wb") as f:
-                    f.write(image_data)
-                result = image_augmentor.augment(temp_path, request.techniques)
-                os.remove(temp_path)
-                return result
-                
-            elif file_type == "audio":
-                # Convert base64 to audio
-                audio_data = base64.b64decode(request.preprocessed_result)
-                temp_path = os.path.join(UPLOAD_DIR, "temp_preprocessed.wav")
-                with open(temp_path, "wb") as f:
-                    f.write(audio_data)
-                result = audio_augmentor.augment(temp_path, request.techniques)
-                os.remove(temp_path)
-                return result
-                
-            elif file_type == "3d":
-                try:
-                    # Decode URL-encoded JSON string
-                    from urllib.parse import unquote
-                    decoded_data = unquote(request.preprocessed_result)
-                    mesh_data = json.loads(decoded_data)
-                    
-                    # Create temporary file with preprocessed mesh data
-                    temp_path = os.path.join(UPLOAD_DIR, "temp_preprocessed.obj")
-                    
-                    # Convert mesh data to trimesh object
-                    import trimesh
-                    import numpy as np
-                    
-                    # Create mesh from vertices and faces
-                    mesh = trimesh.Trimesh(
-                        vertices=np.array(mesh_data['vertices']),
-                        faces=np.array(mesh_data['faces'])
-                    )
-                    
-                    # Save mesh to temporary file
-                    mesh.export(temp_path)
-                    
-                    # Process the mesh
-                    result = mesh_augmentor.augment(temp_path, request.techniques)
-                    os.remove(temp_path)
-                    return result
-                except Exception as e:
-                    print(f"Error processing 3D data: {str(e)}")
-                    return {"error": f"Error processing 3D data: {str(e)}"}
-    
-        # If no preprocessed data or processing failed, use original file
-        file_path = os.path.join(UPLOAD_DIR, request.filename)
+            source = _preprocessed_source(file_type, request.preprocessed_result)
+        else:
+            source = await _upload_path(request.filename)
+            if source is None:
+                return _unknown_file(request.filename)
         
         if file_type == "text":
-            result = text_augmentor.augment(file_path, request.techniques)
+            result = await run_cpu(
+                augmentation.text_augmentor.augment, source, request.techniques,
+                params=request.params, seed=request.seed
+            )
         elif file_type == "image":
-            result = image_augmentor.augment(file_path, request.techniques)
+            result = await run_cpu(
+                augmentation.image_augmentor.augment, source, request.techniques, output,
+                params=request.params, seed=request.seed, codec=codec, quality=quality
+            )
         elif file_type == "audio":
-            result = audio_augmentor.augment(file_path, request.techniques)
+            result = await run_cpu(
+                augmentation.audio_augmentor.augment, source, request.techniques, output,
+                params=request.params, codec=codec
+            )
         elif file_type == "3d":
-            result = mesh_augmentor.augment(file_path, request.techniques)
+            binary = response_format == "binary"
+            result = _mesh_response(
+                await run_cpu(
+                    augmentation.mesh_augmentor.augment, source, request.techniques, binary,
+                    params=request.params, max_faces=max_faces, seed=request.seed
+                )
+            )
         else:
             return {"error": "Unsupported file type"}
         
         return result
         
+    except (PoolBusyError, TaskTimeoutError):
+        raise
     except Exception as e:
         print(f"Error in augment_file: {str(e)}")
-        return {"error": f"Error processing file: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error processing file: {str(e)}"}
+
+@app.post("/jobs/augment")
+async def submit_augment_job(request: BatchAugmentRequest):
+    inputs = []
+    for filename in request.filenames:
+        file_path = await _upload_path(filename)
+        if file_path is None:
+            return JSONResponse(status_code=400, content={"error": f"Unknown file: {filename}"})
+        if not (uploads.file_type_for(filename) or filename.lower().endswith(".zip")):
+            return JSONResponse(status_code=400, content={"error": f"Unsupported file type: {filename}"})
+        inputs.append(file_path)
+    
+    try:
+        job = jobs.submit(
+            inputs,
+            request.techniques,
+            variants=request.variants,
+            output=request.output,
+            seed=request.seed,
+            shard_size=request.shard_size
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return job.progress()
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_io(jobs.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job.progress()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = await run_io(jobs.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    
+    async def events():
+        # Server-sent events with a progress snapshot until the job finishes;
+        # the job may run in another worker, so its saved state is re-read
+        current = job
+        while True:
+            progress = current.progress()
+            yield f"data: {json.dumps(progress)}\n\n"
+            if progress["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.5)
+            current = await run_io(jobs.get, job_id) or current
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/jobs/{job_id}/download")
+async def job_download(job_id: str):
+    job = await run_io(jobs.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    if job.status != "completed" or job.output == "directory":
+        return JSONResponse(status_code=409, content={"error": "No archive available for this job"})
+    return FileResponse(job.output_path, filename=os.path.basename(job.output_path))
+
+@app.post("/pipeline/{file_type}")
+async def run_pipeline(
+    file_type: str,
+    request: PipelineRequest,
+    response_format: str = Query("json", alias="format"),
+    output: str = "base64",
+    codec: Optional[str] = None,
+    quality: Optional[int] = None
+):
+    file_path = await _upload_path(request.filename)
+    if file_path is None:
+        return _unknown_file(request.filename)
+    steps = [step.model_dump() for step in request.steps]
+    result = await run_cpu(
+        pipeline.run,
+        file_type,
+        file_path,
+        steps,
+        output=output,
+        binary=response_format == "binary",
+        codec=codec,
+        quality=quality
+    )
+    return _mesh_response(result)
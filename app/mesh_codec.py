@@ -0,0 +1,81 @@
+"""Compact binary transport for triangle meshes
+
+Layout (all integers little-endian):
+
+    b"MSHP" | uint32 header length | UTF-8 JSON header, space-padded to 4 bytes | buffers
+
+The header maps each mesh name to its vertex/face counts and the byte offsets of
+its float32 vertex buffer (n_vertices * 3) and uint32 index buffer (n_faces * 3).
+Offsets are relative to the end of the header and 4-byte aligned, so browsers
+can wrap the buffers in Float32Array/Uint32Array views without copying.
+"""
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"MSHP"
+MEDIA_TYPE = "application/x-mesh-pack"
+
+_PREFIX = struct.Struct("<4sI")
+
+
+def _pad4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def pack(meshes: Dict[str, Tuple[np.ndarray, np.ndarray]], meta: Optional[dict] = None) -> bytes:
+    """Pack named (vertices, faces) pairs and optional JSON metadata into bytes"""
+    buffers = []
+    entries = {}
+    offset = 0
+    for name, (vertices, faces) in meshes.items():
+        vertex_buf = np.ascontiguousarray(vertices, dtype='<f4').tobytes()
+        face_buf = np.ascontiguousarray(faces, dtype='<u4').tobytes()
+        entries[name] = {
+            "n_vertices": len(vertices),
+            "n_faces": len(faces),
+            "vertex_offset": offset,
+            "face_offset": offset + len(vertex_buf)
+        }
+        buffers.extend([vertex_buf, face_buf])
+        offset += len(vertex_buf) + len(face_buf)
+
+    header = json.dumps({"meshes": entries, "meta": meta or {}}).encode('utf-8')
+    header = header.ljust(_pad4(len(header)), b' ')
+
+    return b"".join([_PREFIX.pack(MAGIC, len(header)), header, *buffers])
+
+
+def is_packed(data: bytes) -> bool:
+    return data[:4] == MAGIC
+
+
+def unpack(data: bytes) -> Tuple[Dict[str, Tuple[np.ndarray, np.ndarray]], Dict[str, Any]]:
+    """Inverse of pack(); the returned arrays are read-only views into data"""
+    magic, header_len = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a packed mesh payload")
+    header = json.loads(data[_PREFIX.size:_PREFIX.size + header_len])
+    data_start = _PREFIX.size + header_len
+    meshes = {}
+    for name, entry in header["meshes"].items():
+        vertices = np.frombuffer(
+            data, dtype='<f4', count=entry["n_vertices"] * 3, offset=data_start + entry["vertex_offset"]
+        ).reshape(-1, 3)
+        faces = np.frombuffer(
+            data, dtype='<u4', count=entry["n_faces"] * 3, offset=data_start + entry["face_offset"]
+        ).reshape(-1, 3)
+        meshes[name] = (vertices, faces)
+    return meshes, header["meta"]
+
+
+def encode(meshes: Dict[str, Tuple[np.ndarray, np.ndarray]], binary: bool = False) -> Union[dict, bytes]:
+    """Encode named meshes as one packed payload or as a dict of JSON strings"""
+    if binary:
+        return pack(meshes)
+    return {
+        name: json.dumps({"vertices": vertices.tolist(), "faces": faces.tolist()})
+        for name, (vertices, faces) in meshes.items()
+    }
@@ -0,0 +1,124 @@
+import mmap
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import config, mesh_codec
+from .cache import file_digest
+from .decoders import load_mesh_arrays
+
+# Face-count ratios of the precomputed levels, finest first
+LEVELS = (0.5, 0.1, 0.01)
+# Pyramids are stored as <content SHA-256><SUFFIX> in LOD_DIR
+SUFFIX = ".mshp"
+
+
+def _cluster(vertices: np.ndarray, faces: np.ndarray, resolution: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Snap vertices to a resolution^3 grid, merge each occupied cell into the
+    # mean of its vertices and drop the faces that collapse
+    low = vertices.min(axis=0)
+    extent = max(float((vertices.max(axis=0) - low).max()), np.finfo(np.float64).tiny)
+    cells = ((vertices - low) * (resolution / extent)).astype(np.int64)
+    np.clip(cells, 0, resolution - 1, out=cells)
+    keys = (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+    _, cluster = np.unique(keys, return_inverse=True)
+
+    counts = np.bincount(cluster).astype(np.float64)
+    merged = np.stack(
+        [np.bincount(cluster, weights=vertices[:, axis]) / counts for axis in range(3)],
+        axis=1
+    )
+
+    new_faces = cluster[faces]
+    keep = (
+        (new_faces[:, 0] != new_faces[:, 1])
+        & (new_faces[:, 1] != new_faces[:, 2])
+        & (new_faces[:, 0] != new_faces[:, 2])
+    )
+    new_faces = new_faces[keep]
+    # Drop clusters only referenced by collapsed faces
+    used, new_faces = np.unique(new_faces, return_inverse=True)
+    return merged[used], new_faces.reshape(-1, 3)
+
+
+def decimate(vertices: np.ndarray, faces: np.ndarray, max_faces: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return a vertex-clustered version of a mesh with at most max_faces faces
+
+    Meshes already within the budget are returned unchanged.
+    """
+    if len(faces) <= max_faces:
+        return vertices, faces
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces)
+    # Surface meshes keep roughly 2 * resolution^2 faces after clustering
+    resolution = max(int(np.sqrt(max_faces / 2)), 2)
+    for _ in range(8):
+        lod_vertices, lod_faces = _cluster(vertices, faces, resolution)
+        if len(lod_faces) <= max_faces or resolution <= 2:
+            break
+        resolution = max(int(resolution * np.sqrt(max_faces / len(lod_faces)) * 0.95), 2)
+    return lod_vertices, lod_faces.astype(faces.dtype)
+
+
+def path_for_digest(digest: str) -> str:
+    return os.path.join(config.LOD_DIR, digest + SUFFIX)
+
+
+def pyramid_path(file_path: str) -> str:
+    return path_for_digest(file_digest(file_path))
+
+
+def build_pyramid(file_path: str) -> str:
+    """Decimate a mesh file to every level in LEVELS and store them under LOD_DIR
+
+    Pyramids are keyed by content hash, so unchanged files are only built once.
+    The full resolution is not stored again; it comes from mesh_store.
+    Returns the path of the stored mesh_codec payload.
+    """
+    path = pyramid_path(file_path)
+    if os.path.exists(path):
+        return path
+    vertices, faces = load_mesh_arrays(file_path)
+    levels = {
+        f"{ratio:g}": decimate(vertices, faces, max(int(len(faces) * ratio), 1))
+        for ratio in LEVELS
+    }
+    os.makedirs(config.LOD_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=config.LOD_DIR, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(mesh_codec.pack(levels))
+    os.replace(tmp_path, path)
+    return path
+
+
+def _load_pyramid(file_path: str) -> Optional[List[Tuple[np.ndarray, np.ndarray]]]:
+    # The levels are views into a memory map of the pyramid, so only the
+    # pages of the level that is used are read
+    try:
+        with open(pyramid_path(file_path), "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    meshes, _ = mesh_codec.unpack(data)
+    return sorted(meshes.values(), key=lambda level: len(level[1]), reverse=True)
+
+
+def level_for(file_path: str, max_faces: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (vertices, faces) of the finest level of a mesh file within max_faces faces
+
+    Meshes within the budget are returned at full resolution. Otherwise the
+    stored pyramid is used when it has been built, and the mesh is decimated
+    on the fly when it has not, or when even the coarsest level is over the budget.
+    """
+    vertices, faces = load_mesh_arrays(file_path)
+    if len(faces) <= max_faces:
+        return vertices, faces
+    levels = _load_pyramid(file_path)
+    if levels is None:
+        return decimate(vertices, faces, max_faces)
+    for level_vertices, level_faces in levels:
+        if len(level_faces) <= max_faces:
+            return level_vertices, level_faces
+    return decimate(*levels[-1], max_faces)
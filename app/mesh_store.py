@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+from . import metrics
+from .cache import file_digest
+
+if TYPE_CHECKING:
+    import trimesh
+
+# Directory next to each mesh file holding its parsed arrays and stats
+SUFFIX = ".arrays"
+# Bumped when the stored layout changes, so older stores are rebuilt
+VERSION = 1
+
+
+def store_path(file_path: str) -> str:
+    return file_path + SUFFIX
+
+
+def mesh_stats(vertices: np.ndarray, faces: np.ndarray) -> dict:
+    """Return the counts, bounds, volume and center of mass of a mesh, as trimesh computes them
+
+    Computed on the arrays in a few vectorized passes, so they are affordable
+    for meshes of any size. volume and center_mass are "N/A" unless the mesh is
+    watertight, i.e. every edge is shared by exactly two faces.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    stats = {
+        "n_vertices": len(vertices),
+        "n_faces": len(faces),
+        "bounds": [vertices.min(axis=0).tolist(), vertices.max(axis=0).tolist()] if len(vertices) else None
+    }
+
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    _, counts = np.unique(edges[:, 0] * len(vertices) + edges[:, 1], return_counts=True)
+    if not len(faces) or not np.all(counts == 2):
+        stats["volume"] = "N/A"
+        stats["center_mass"] = "N/A"
+        return stats
+
+    # Signed volumes of the tetrahedra spanned by the origin and each face
+    triangles = vertices[faces]
+    volumes = np.einsum('ij,ij->i', triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])) / 6
+    volume = volumes.sum()
+    stats["volume"] = float(volume)
+    # Each tetrahedron's centroid is a quarter of its face's vertex sum (the origin adds nothing)
+    stats["center_mass"] = ((volumes[:, np.newaxis] * triangles.sum(axis=1)).sum(axis=0) / (4 * volume)).tolist()
+    return stats
+
+
+def _read_meta(file_path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(store_path(file_path), "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Stores of replaced uploads describe other content
+    if meta.get("version") != VERSION or meta.get("sha256") != file_digest(file_path):
+        return None
+    return meta
+
+
+def load(file_path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return the stored (vertices, faces) of a mesh file, or None if not stored
+
+    The arrays are read-only memory maps, so opening them costs nothing up
+    front and processes reading the same store share its pages.
+    """
+    if _read_meta(file_path) is None:
+        return None
+    path = store_path(file_path)
+    with metrics.span("read", "3d"):
+        return (
+            np.load(os.path.join(path, "vertices.npy"), mmap_mode='r'),
+            np.load(os.path.join(path, "faces.npy"), mmap_mode='r')
+        )
+
+
+def stats(file_path: str) -> Optional[dict]:
+    """Return the stats stored with a mesh file's arrays, or None if not stored"""
+    meta = _read_meta(file_path)
+    return meta["stats"] if meta else None
+
+
+def save(file_path: str, mesh: "trimesh.Trimesh") -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Store the arrays and stats of the mesh parsed from file_path
+
+    Returns the stored arrays as load() does, or None when the store could
+    not be written, e.g. next to a file in a read-only directory.
+    """
+    meta = {
+        "version": VERSION,
+        "sha256": file_digest(file_path),
+        "stats": mesh_stats(mesh.vertices, mesh.faces)
+    }
+    path = store_path(file_path)
+    tmp_dir = None
+    try:
+        # Written aside and renamed into place, so readers never see a partial store
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".part")
+        np.save(os.path.join(tmp_dir, "vertices.npy"), np.ascontiguousarray(mesh.vertices, dtype=np.float32))
+        np.save(os.path.join(tmp_dir, "faces.npy"), np.ascontiguousarray(mesh.faces, dtype=np.int32))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        if _read_meta(file_path) is not None:
+            # Another process stored the same mesh meanwhile
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_dir, path)
+    except OSError as e:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if _read_meta(file_path) is None:
+            print(f"Error storing mesh arrays: {str(e)}")
+            return None
+    return load(file_path)
@@ -0,0 +1,255 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Upper bounds of the size histogram buckets, in bytes: 1 KiB to 256 MiB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
+
+# (metric name, labels, value) of an observation made in a pool task
+Observation = Tuple[str, Tuple[str, ...], float]
+
+
+def _format(pairs: List[str], le: Optional[str] = None) -> str:
+    if le is not None:
+        pairs = pairs + ['le="' + le + '"']
+    return "{" + ",".join(pairs) + "}"
+
+
+class Histogram:
+    """Thread-safe histogram rendered in the Prometheus text format"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...],
+        buckets: Tuple[float, ...] = BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> (bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(b), s, c)) for labels, (b, s, c) in self._series.items())
+        for labels, (buckets, total, count) in series:
+            pairs = [f'{name}="{value}"' for name, value in zip(self.label_names, labels)]
+            for bound, bucket in zip(self.buckets, buckets):
+                # :g would round byte counts such as 1048576
+                le = str(bound) if isinstance(bound, int) else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format(pairs, le)} {bucket}")
+            lines.append(f"{self.name}_bucket{_format(pairs, '+Inf')} {count}")
+            lines.append(f"{self.name}_sum{_format(pairs)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format(pairs)} {count}")
+        return lines
+
+
+class Gauge:
+    """Thread-safe gauge rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            pairs = [f'{name}="{label}"' for name, label in zip(self.label_names, labels)]
+            lines.append(f"{self.name}{_format(pairs)} {value:.6f}")
+        return lines
+
+
+class Counter:
+    """Thread-safe counter rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            pairs = [f'{name}="{label}"' for name, label in zip(self.label_names, labels)]
+            lines.append(f"{self.name}{_format(pairs)} {value:g}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Time spent reading, decoding, transforming, encoding and serializing inputs",
+    ("stage", "modality", "technique")
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ("method", "route", "status")
+)
+OUTPUT_BYTES = Histogram(
+    "encoded_output_bytes",
+    "Size of encoded image and audio results",
+    ("modality", "codec"),
+    SIZE_BUCKETS
+)
+STARTUP_SECONDS = Gauge(
+    "startup_seconds",
+    "Seconds spent importing, warming up and until the app was ready to serve",
+    ("phase",)
+)
+CACHE_EVENTS = Counter(
+    "cache_events_total",
+    "Hits, misses and evictions of the in-memory caches, summed over worker processes",
+    ("cache", "event")
+)
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Entries held by the in-memory caches of each process",
+    ("cache", "pid")
+)
+CACHE_BYTES = Gauge(
+    "cache_bytes",
+    "Bytes held by the in-memory caches of each process",
+    ("cache", "pid")
+)
+_METRICS = {
+    metric.name: metric
+    for metric in (STAGE_SECONDS, REQUEST_SECONDS, OUTPUT_BYTES, CACHE_EVENTS, CACHE_ENTRIES, CACHE_BYTES)
+}
+
+# Labels that spans without explicit ones inherit
+_labels: ContextVar[Tuple[str, str]] = ContextVar("metrics_labels", default=("", ""))
+# Observations made in a worker, returned to the parent with the task's result
+_collected: ContextVar[Optional[List[Observation]]] = ContextVar("metrics_collected", default=None)
+# Seconds per stage of the request being handled, when it asked for a breakdown
+_breakdown: ContextVar[Optional[Dict[str, float]]] = ContextVar("metrics_breakdown", default=None)
+
+
+def _record(name: str, labels: Tuple[str, ...], value: float) -> None:
+    metric = _METRICS[name]
+    if isinstance(metric, Gauge):
+        metric.set(value, *labels)
+    else:
+        metric.observe(value, *labels)
+    breakdown = _breakdown.get()
+    if breakdown is not None and name == STAGE_SECONDS.name:
+        breakdown[labels[0]] = breakdown.get(labels[0], 0.0) + value
+
+
+def observe(metric: Union[Histogram, Counter, Gauge], value: float, *labels: str) -> None:
+    """Record a value in a metric, or in the task's observations inside collect()"""
+    collected = _collected.get()
+    if collected is not None:
+        collected.append((metric.name, labels, value))
+    else:
+        _record(metric.name, labels, value)
+
+
+@contextmanager
+def labels(modality: str, technique: str = "") -> Iterator[None]:
+    """Label the spans inside the block that do not set their own labels"""
+    token = _labels.set((modality, technique))
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+@contextmanager
+def span(stage: str, modality: Optional[str] = None, technique: Optional[str] = None) -> Iterator[None]:
+    """Time the block as one stage of a modality and technique"""
+    inherited = _labels.get()
+    modality = inherited[0] if modality is None else modality
+    technique = inherited[1] if technique is None else technique
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(STAGE_SECONDS, time.perf_counter() - start, stage, modality, technique)
+
+
+def collect(fn: Callable, *args, **kwargs) -> Tuple[Any, List[Observation]]:
+    """Call fn and return its result with the observations made meanwhile
+
+    Pools run tasks through this, so spans from worker processes reach the
+    parent's histograms and the breakdown of the request that submitted them.
+    """
+    token = _collected.set([])
+    try:
+        return fn(*args, **kwargs), _collected.get()
+    finally:
+        _collected.reset(token)
+
+
+def record_all(observations: List[Observation]) -> None:
+    for name, labels, value in observations:
+        _record(name, labels, value)
+
+
+@contextmanager
+def breakdown() -> Iterator[Dict[str, float]]:
+    """Collect the seconds per stage of everything recorded inside the block"""
+    stages: Dict[str, float] = {}
+    token = _breakdown.set(stages)
+    try:
+        yield stages
+    finally:
+        _breakdown.reset(token)
+
+
+def server_timing(stages: Dict[str, float], total: float) -> str:
+    """Format a breakdown as a Server-Timing header value, in milliseconds"""
+    entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def render() -> str:
+    lines = []
+    for metric in (*_METRICS.values(), STARTUP_SECONDS):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
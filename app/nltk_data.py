@@ -0,0 +1,41 @@
+import os
+from typing import List
+
+import nltk
+
+from . import config
+
+# NLTK packages used by the text modules and the resource each one provides
+PACKAGES = {
+    "punkt": "tokenizers/punkt",
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet"
+}
+
+
+def configure() -> None:
+    """Look for NLTK data in NLTK_DATA_DIR first; nothing is downloaded on import"""
+    if config.NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, config.NLTK_DATA_DIR)
+
+
+def missing() -> List[str]:
+    configure()
+    packages = []
+    for package, resource in PACKAGES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            packages.append(package)
+    return packages
+
+
+def download() -> None:
+    """Download missing packages into NLTK_DATA_DIR"""
+    os.makedirs(config.NLTK_DATA_DIR, exist_ok=True)
+    for package in missing():
+        nltk.download(package, download_dir=config.NLTK_DATA_DIR)
+
+
+if __name__ == "__main__":
+    download()
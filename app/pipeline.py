@@ -0,0 +1,93 @@
+import html
+import importlib
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from . import encoders, mesh_codec, metrics
+from .artifacts import encode_result
+from .decoders import load_audio, load_image, load_mesh_arrays
+
+_MODULES = {
+    "text": ("text_processor", "text_augmentor"),
+    "image": ("image_processor", "image_augmentor"),
+    "audio": ("audio_processor", "audio_augmentor"),
+    "3d": ("mesh_processor", "mesh_augmentor")
+}
+
+
+def ops_for(file_type: str) -> Dict[str, Callable]:
+    """Return the preprocessing and augmentation ops of a modality, which share one namespace"""
+    if file_type not in _MODULES:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    processor, augmentor = _MODULES[file_type]
+    return {
+        **importlib.import_module(f".preprocessing.{processor}", __package__).OPS,
+        **importlib.import_module(f".augmentation.{augmentor}", __package__).OPS
+    }
+
+
+def _resolve(file_type: str, steps: List[Dict[str, Any]]) -> List[Tuple[str, Callable, dict]]:
+    ops = ops_for(file_type)
+    resolved = []
+    for step in steps:
+        if step["op"] not in ops:
+            raise ValueError(f"Unknown op for {file_type}: {step['op']}")
+        resolved.append((step["op"], ops[step["op"]], step.get("params") or {}))
+    return resolved
+
+
+def run(
+    file_type: str,
+    file_path: str,
+    steps: List[Dict[str, Any]],
+    output: str = "base64",
+    binary: bool = False,
+    codec: Optional[str] = None,
+    quality: Optional[int] = None
+) -> Union[dict, bytes]:
+    """Decode the input once, apply steps in order in memory and encode the final result
+
+    Each step is {"op": name, "params": {...}}. The result has the same shape as
+    process()/augment() results, with a single "pipeline" entry. Image and
+    audio results are encoded with codec and quality, as in encoders.
+    """
+    try:
+        resolved = _resolve(file_type, steps)
+
+        if file_type == "text":
+            from .preprocessing import text_processor
+
+            # Streamed a chunk at a time; CSVs cell by cell in their text columns
+            text = text_processor.transform_file(file_path, resolved)
+            with metrics.span("serialize", file_type, "pipeline"):
+                return {"pipeline": html.escape(text)}
+
+        if file_type == "image":
+            img = load_image(file_path)
+            for name, op, params in resolved:
+                with metrics.span("transform", file_type, name):
+                    img = op(img, **params)
+            with metrics.span("encode", file_type, "pipeline"):
+                data, ext = encoders.encode_image(img, codec, quality)
+            with metrics.span("serialize", file_type, "pipeline"):
+                return {"pipeline": encode_result(data, ext, output)}
+
+        if file_type == "audio":
+            audio, sr = load_audio(file_path)
+            for name, op, params in resolved:
+                with metrics.span("transform", file_type, name):
+                    audio = op(audio, sr, **params)
+            with metrics.span("encode", file_type, "pipeline"):
+                data, ext = encoders.encode_audio(audio, sr, codec, quality)
+            with metrics.span("serialize", file_type, "pipeline"):
+                return {"pipeline": encode_result(data, ext, output)}
+
+        # Mesh ops return new arrays, so the cached ones are passed in directly
+        vertices, faces = load_mesh_arrays(file_path)
+        for name, op, params in resolved:
+            with metrics.span("transform", file_type, name):
+                vertices, faces = op(vertices, faces, **params)
+        with metrics.span("encode" if binary else "serialize", file_type, "pipeline"):
+            return mesh_codec.encode({"pipeline": (vertices, faces)}, binary)
+
+    except Exception as e:
+        return {"error": str(e)}
@@ -1,4 +1,11 @@
-from . import image_processor
-from . import text_processor
-from . import audio_processor
-from . import mesh_processor 
\ No newline at end of file
+import importlib
+
+# Submodules pull in heavy per-modality libraries (librosa, trimesh, nltk,
+# pandas), so each one is imported on first use
+__all__ = ["image_processor", "text_processor", "audio_processor", "mesh_processor"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,18 +2,26 @@ import librosa
 import soundfile as sf
 import numpy as np
 import base64
-from typing import List
+from functools import partial
+from typing import Dict, List, Optional
 import io
 
-def get_preview(file_path: str) -> str:
-    """Return base64 encoded preview of the audio"""
+from .. import audio_stream, encoders, metrics, spectral
+from ..artifacts import encode_result
+from ..decoders import load_audio
+
+def get_preview(file_path: str, seconds: int = 10) -> str:
+    """Return base64 encoded preview of the first seconds of the audio"""
     try:
-        # Load the audio file
-        audio, sr = librosa.load(file_path)
-        
-        # Trim to first 10 seconds if longer
-        if len(audio) > sr * 10:
-            audio = audio[:sr * 10]
+        try:
+            # Read only the frames needed, at the native rate
+            with sf.SoundFile(file_path) as f:
+                audio = f.read(frames=f.samplerate * seconds, dtype='float32')
+                sr = f.samplerate
+        except sf.LibsndfileError:
+            # Formats libsndfile cannot read go through librosa, which still
+            # stops decoding after the requested duration
+            audio, sr = librosa.load(file_path, sr=None, duration=seconds)
         
         # Save to buffer
         buffer = io.BytesIO()
@@ -24,35 +32,58 @@ def get_preview(file_path: str) -> str:
     except Exception as e:
         return f"Error processing audio: {str(e)}"
 
-def process(file_path: str, techniques: List[str]) -> dict:
-    """Apply preprocessing techniques to the audio"""
+def normalize(audio: np.ndarray, sr: int) -> np.ndarray:
+    return librosa.util.normalize(audio)
+
+def noise_reduction(audio: np.ndarray, sr: int, noise_frames: int = 10) -> np.ndarray:
+    # Simple noise reduction using spectral subtraction, estimating the
+    # noise floor from the first noise_frames STFT frames
+    return spectral.spectral_subtraction(audio, noise_frames)
+
+def trim_silence(audio: np.ndarray, sr: int, top_db: float = 20) -> np.ndarray:
+    trimmed, _ = librosa.effects.trim(audio, top_db=top_db)
+    return trimmed
+
+OPS = {
+    "normalize": normalize,
+    "noise_reduction": noise_reduction,
+    "trim_silence": trim_silence
+}
+
+def process(
+    file_path: str,
+    techniques: List[str],
+    output: str = "base64",
+    params: Optional[Dict[str, dict]] = None,
+    codec: Optional[str] = None
+) -> dict:
+    """Apply preprocessing techniques to the audio and encode the results with codec"""
     results = {}
+    params = params or {}
+    
+    if audio_stream.should_stream(file_path):
+        # Long recordings are processed block by block straight to disk
+        return audio_stream.run(file_path, techniques, OPS, output, params, codec)
     
     try:
+        codec = encoders.audio_codec(codec)
         # Load the audio file
-        audio, sr = librosa.load(file_path)
+        audio, sr = load_audio(file_path)
         
+        processed = {}
         for technique in techniques:
-            if technique == "normalize":
-                processed = librosa.util.normalize(audio)
-            
-            elif technique == "noise_reduction":
-                # Simple noise reduction using spectral subtraction
-                S = librosa.stft(audio)
-                mag = np.abs(S)
-                noise_mag = np.mean(mag[:, :10], axis=1, keepdims=True)
-                processed = librosa.istft(mag - noise_mag)
-            
-            elif technique == "trim_silence":
-                processed, _ = librosa.effects.trim(audio, top_db=20)
-            
-            # Save processed audio to buffer
-            buffer = io.BytesIO()
-            sf.write(buffer, processed, sr, format='wav')
-            buffer.seek(0)
-            results[technique] = base64.b64encode(buffer.read()).decode()
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+            with metrics.span("transform", "audio", technique):
+                processed[technique] = OPS[technique](audio, sr, **params.get(technique, {}))
+        
+        # Encode processed audio as base64 or artifact URLs
+        encoded = encoders.encode_all(processed, partial(encoders.encode_audio, sr=sr, codec=codec), "audio")
+        for technique, (data, ext) in encoded.items():
+            with metrics.span("serialize", "audio", technique):
+                results[technique] = encode_result(data, ext, output)
             
     except Exception as e:
         results["error"] = str(e)
     
-    return results 
\ No newline at end of file
+    return results 
@@ -1,38 +1,94 @@
 from PIL import Image
 import numpy as np
-from typing import List
+from typing import Dict, List, Optional
 import base64
+from functools import partial
 from io import BytesIO
 
+from .. import encoders, metrics
+from ..artifacts import encode_result
+from ..decoders import load_image
+
 def get_preview(file_path: str) -> str:
-    """Return base64 encoded preview of the image"""
-    with Image.open(file_path) as img:
-        # Resize for preview if needed
-        max_size = (800, 800)
-        img.thumbnail(max_size)
-        
-        # Convert to base64
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode()
+    """Return a base64 encoded JPEG thumbnail of the image"""
+    # Decode at reduced size when possible; thumbnail() resizes in place, so
+    # work on a copy of the cached image
+    max_size = (800, 800)
+    img = load_image(file_path, size=max_size).copy()
+    
+    # Resize for preview if needed
+    img.thumbnail(max_size)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    # Convert to base64
+    buffered = BytesIO()
+    img.save(buffered, format="JPEG", quality=85)
+    return base64.b64encode(buffered.getvalue()).decode()
+
+def grayscale(img: Image.Image) -> Image.Image:
+    return img.convert('L')
+
+def resize(img: Image.Image, width: int = 224, height: int = 224) -> Image.Image:
+    return img.resize((width, height))
 
-def process(file_path: str, techniques: List[str]) -> dict:
-    """Apply preprocessing techniques to the image"""
+def normalize(img: Image.Image) -> Image.Image:
+    # Stretch each channel to the full 0-255 range. This goes through a 256-entry
+    # lookup table per channel, so no full-resolution float copy is allocated
+    if img.mode not in ('L', 'RGB'):
+        img = img.convert('RGB')
+    extrema = img.getextrema()
+    if img.mode == 'L':
+        extrema = (extrema,)
+    values = np.arange(256, dtype=np.float32)
+    lut = []
+    for low, high in extrema:
+        scaled = (values - low) * (255.0 / max(high - low, 1))
+        lut.extend(np.clip(np.rint(scaled), 0, 255).astype(np.uint8).tolist())
+    return img.point(lut)
+
+OPS = {
+    "grayscale": grayscale,
+    "resize": resize,
+    "normalize": normalize
+}
+
+def process(
+    file_path: str,
+    techniques: List[str],
+    output: str = "base64",
+    params: Optional[Dict[str, dict]] = None,
+    codec: Optional[str] = None,
+    quality: Optional[int] = None
+) -> dict:
+    """Apply preprocessing techniques to the image and encode the results with codec"""
     results = {}
-    img = Image.open(file_path)
-    
-    for technique in techniques:
-        if technique == "grayscale":
-            processed = img.convert('L')
-        elif technique == "resize":
-            processed = img.resize((224, 224))
-        elif technique == "normalize":
-            img_array = np.array(img) / 255.0
-            processed = Image.fromarray((img_array * 255).astype(np.uint8))
+    params = params or {}
+
+    try:
+        codec = encoders.image_codec(codec)
+        
+        processed = {}
+        for technique in techniques:
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+            kwargs = params.get(technique, {})
+            if technique == "resize":
+                # The target size is known, so let the decoder downscale (JPEG draft)
+                size = (kwargs.get("width", 224), kwargs.get("height", 224))
+                img = load_image(file_path, size=size)
+            else:
+                img = load_image(file_path)
+            with metrics.span("transform", "image", technique):
+                processed[technique] = OPS[technique](img, **kwargs)
         
-        # Convert processed image to base64
-        buffered = BytesIO()
-        processed.save(buffered, format="PNG")
-        results[technique] = base64.b64encode(buffered.getvalue()).decode()
+        # Encode processed images as base64 or artifact URLs
+        encoded = encoders.encode_all(processed, partial(encoders.encode_image, codec=codec, quality=quality), "image")
+        for technique, (data, ext) in encoded.items():
+            with metrics.span("serialize", "image", technique):
+                results[technique] = encode_result(data, ext, output)
+
+    except Exception as e:
+        results["error"] = str(e)
     
-    return results 
\ No newline at end of file
+    return results 
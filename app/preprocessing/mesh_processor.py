@@ -1,85 +1,113 @@
 import trimesh
 import numpy as np
-import base64
-from typing import List
+from typing import Dict, List, Optional, Tuple, Union
 import json
-import os
 
-def get_preview(file_path: str) -> str:
-    """Return preview data of the 3D mesh"""
+from .. import config, mesh_codec, mesh_lod, mesh_store, metrics
+from ..decoders import load_mesh_arrays
+
+def get_preview(file_path: str, binary: bool = False, max_faces: Optional[int] = None) -> Union[str, bytes]:
+    """Return preview data of the 3D mesh
+
+    Meshes with more than max_faces (default PREVIEW_MAX_FACES) faces are shown
+    at the nearest LOD level; the stats describe the full mesh. With binary=True
+    the geometry is returned as a mesh_codec payload holding a single "preview"
+    mesh, with the stats in its metadata.
+    """
     try:
-        # Force using the appropriate loader based on file extension
-        file_ext = os.path.splitext(file_path)[1].lower()
-        if file_ext == '.off':
-            mesh = trimesh.load_mesh(file_path, file_type='off')
-        else:
-            mesh = trimesh.load(file_path)
+        max_faces = max_faces or config.PREVIEW_MAX_FACES
+        # Stats are computed once, when the upload is first parsed and stored
+        load_mesh_arrays(file_path)
+        stats = mesh_store.stats(file_path)
+        if stats is None:
+            stats = mesh_store.mesh_stats(*load_mesh_arrays(file_path))
+        vertices, faces = mesh_lod.level_for(file_path, max_faces)
+        stats["preview_faces"] = len(faces)
+        
+        if binary:
+            return mesh_codec.pack(
+                {"preview": (vertices, faces)},
+                meta={"stats": stats}
+            )
 
         preview_data = {
-            "vertices": mesh.vertices.tolist(),
-            "faces": mesh.faces.tolist(),
-            "stats": {
-                "n_vertices": len(mesh.vertices),
-                "n_faces": len(mesh.faces),
-                "bounds": mesh.bounds.tolist(),
-                "volume": float(mesh.volume) if mesh.is_watertight else "N/A",
-                "center_mass": mesh.center_mass.tolist()
-            }
+            "vertices": vertices.tolist(),
+            "faces": faces.tolist(),
+            "stats": stats
         }
         return json.dumps(preview_data)
     except Exception as e:
         return f"Error processing mesh: {str(e)}"
 
-def process(file_path: str, techniques: List[str]) -> dict:
-    """Apply preprocessing techniques to the 3D mesh"""
-    results = {}
+# Ops take and return (vertices, faces) arrays and never modify their inputs,
+# so cached arrays can be passed directly
+
+def normalize(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Normalize to unit cube
+    extents = vertices.max(axis=0) - vertices.min(axis=0)
+    return vertices * np.float32(1.0 / np.max(extents)), faces
+
+def _centroid(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    # Area-weighted mean of the triangle centers, as trimesh computes it
+    triangles = vertices[faces]
+    areas = np.linalg.norm(
+        np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]),
+        axis=1
+    )
+    if not areas.sum():
+        return vertices.mean(axis=0)
+    return (triangles.mean(axis=1) * areas[:, np.newaxis]).sum(axis=0) / areas.sum()
+
+def center(vertices: np.ndarray, faces: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return vertices - _centroid(vertices, faces).astype(vertices.dtype), faces
+
+def simplify(vertices: np.ndarray, faces: np.ndarray, ratio: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    target_faces = max(int(len(faces) * ratio), 1)
+    try:
+        # Use trimesh's built-in simplification
+        mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+        processed = mesh.simplify_quadratic_decimation(target_faces)
+        
+        if processed is None or len(processed.faces) == 0:
+            raise ValueError("quadratic decimation returned an empty mesh")
+        return processed.vertices, processed.faces
+    except Exception as e:
+        print(f"Simplification error: {str(e)}")
+        # Fall back to vertex clustering, which needs no optional dependencies
+        return mesh_lod.decimate(vertices, faces, target_faces)
+
+OPS = {
+    "normalize": normalize,
+    "center": center,
+    "simplify": simplify
+}
+
+def process(
+    file_path: str,
+    techniques: List[str],
+    binary: bool = False,
+    params: Optional[Dict[str, dict]] = None
+) -> Union[dict, bytes]:
+    """Apply preprocessing techniques to the 3D mesh
+
+    With binary=True all results are returned as a single mesh_codec payload
+    keyed by technique; errors are still reported as a dict.
+    """
+    params = params or {}
     
     try:
-        # Force using the appropriate loader based on file extension
-        file_ext = os.path.splitext(file_path)[1].lower()
-        if file_ext == '.off':
-            mesh = trimesh.load_mesh(file_path, file_type='off')
-        else:
-            mesh = trimesh.load(file_path)
+        vertices, faces = load_mesh_arrays(file_path)
         
+        meshes = {}
         for technique in techniques:
-            if technique == "normalize":
-                # Normalize to unit cube
-                extents = mesh.extents
-                scale = 1.0 / np.max(extents)
-                processed = mesh.copy()
-                processed.apply_scale(scale)
-            
-            elif technique == "center":
-                processed = mesh.copy()
-                processed.vertices -= processed.centroid
-            
-            elif technique == "simplify":
-                try:
-                    # Use trimesh's built-in simplification
-                    processed = mesh.copy()
-                    target_faces = len(mesh.faces) // 2  # Reduce to 50%
-                    processed = processed.simplify_quadratic_decimation(target_faces)
-                    
-                    if processed is None or len(processed.faces) == 0:
-                        # Fallback to vertex clustering if quadratic decimation fails
-                        processed = mesh.copy()
-                        processed = processed.simplify_vertex_clustering(
-                            spacing=mesh.bounding_box.extents.max() / 32
-                        )
-                except Exception as e:
-                    print(f"Simplification error: {str(e)}")
-                    # If both simplification methods fail, return original mesh
-                    processed = mesh.copy()
-            
-            # Convert processed mesh to JSON-compatible format
-            result_data = {
-                "vertices": processed.vertices.tolist(),
-                "faces": processed.faces.tolist()
-            }
-            results[technique] = json.dumps(result_data)
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+            with metrics.span("transform", "3d", technique):
+                meshes[technique] = OPS[technique](vertices, faces, **params.get(technique, {}))
+        
+        # Packing is the binary encoding; JSON results are serialized to lists
+        with metrics.span("encode" if binary else "serialize", "3d"):
+            return mesh_codec.encode(meshes, binary)
             
     except Exception as e:
-        results["error"] = str(e)
-    
-    return results
\ No newline at end of file
+        return {"error": str(e)}
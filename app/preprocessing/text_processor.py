@@ -1,21 +1,29 @@
-import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 import string
 import pandas as pd
-import base64
-from typing import List
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
 
-# Download required NLTK data
-nltk.download('punkt')
-nltk.download('stopwords')
+from .. import metrics, nltk_data
+
+nltk_data.configure()
+
+# Large inputs are processed in chunks of whole lines / CSV rows
+_CHUNK_CHARS = 1 << 20
+_CSV_CHUNK_ROWS = 10000
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+@lru_cache(maxsize=None)
+def _stopwords(language: str) -> frozenset:
+    return frozenset(stopwords.words(language))
 
 def get_preview(file_path: str) -> str:
     """Return preview of the text file"""
     try:
         if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-            preview = df.head().to_string()
+            df = pd.read_csv(file_path, nrows=5)
+            preview = df.to_string()
         else:
             with open(file_path, 'r', encoding='utf-8') as file:
                 preview = file.read(1000)  # Read first 1000 characters
@@ -23,38 +31,197 @@ def get_preview(file_path: str) -> str:
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
-def process(file_path: str, techniques: List[str]) -> dict:
-    """Apply preprocessing techniques to the text"""
+def read_text(file_path: str) -> str:
+    """Return the raw content of a text or CSV file as a string
+
+    For small inputs only; large files go through iter_chunks() or
+    transform_file().
+    """
+    with metrics.span("read", "text"):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read()
+
+def iter_chunks(file_path: str) -> Iterator[str]:
+    """Yield the content of a text file in chunks of whole lines"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            lines = file.readlines(_CHUNK_CHARS)
+            if not lines:
+                break
+            yield ''.join(lines)
+
+def lowercase(text: str) -> str:
+    return text.lower()
+
+def remove_punctuation(text: str) -> str:
+    return text.translate(_PUNCTUATION_TABLE)
+
+def _filter_stopwords(tokens: List[str], language: str = 'english') -> List[str]:
+    stop_words = _stopwords(language)
+    return [word for word in map(str.lower, tokens) if word not in stop_words]
+
+def tokenize(text: str) -> str:
+    tokens = word_tokenize(text)
+    return ' '.join(tokens)
+
+def remove_stopwords(text: str, language: str = 'english') -> str:
+    return ' '.join(_filter_stopwords(word_tokenize(text), language))
+
+OPS = {
+    "lowercase": lowercase,
+    "remove_punctuation": remove_punctuation,
+    "tokenize": tokenize,
+    "remove_stopwords": remove_stopwords
+}
+
+# Techniques that work on the token stream, so a text is tokenized only once
+# however many of them are requested
+TOKEN_OPS = {
+    "tokenize": lambda tokens: tokens,
+    "remove_stopwords": _filter_stopwords
+}
+
+def _apply(text: str, techniques: List[str], params: Dict[str, dict]) -> Dict[str, str]:
+    results = {}
+    tokens = None
+    for technique in techniques:
+        kwargs = params.get(technique, {})
+        with metrics.span("transform", "text", technique):
+            if technique in TOKEN_OPS:
+                if tokens is None:
+                    tokens = word_tokenize(text)
+                results[technique] = ' '.join(TOKEN_OPS[technique](tokens, **kwargs))
+            else:
+                results[technique] = OPS[technique](text, **kwargs)
+    return results
+
+# Vectorized versions of the character-level ops for CSV columns
+SERIES_OPS = {
+    "lowercase": lambda series: series.str.lower(),
+    "remove_punctuation": lambda series: series.str.translate(_PUNCTUATION_TABLE)
+}
+
+def _apply_series(series: pd.Series, techniques: List[str], params: Dict[str, dict]) -> Dict[str, pd.Series]:
+    # Like _apply() for a whole column, with one span per technique rather than per cell
     results = {}
+    tokens = None
+    for technique in techniques:
+        kwargs = params.get(technique, {})
+        with metrics.span("transform", "text", technique):
+            if technique in TOKEN_OPS:
+                if tokens is None:
+                    tokens = series.map(word_tokenize)
+                token_op = TOKEN_OPS[technique]
+                results[technique] = tokens.map(lambda cell: ' '.join(token_op(cell, **kwargs)))
+            else:
+                results[technique] = SERIES_OPS[technique](series, **kwargs)
+    return results
+
+def _join_chunks(parts: List[str]) -> str:
+    # Chunks end at line breaks unless an op dropped them, e.g. by tokenizing;
+    # those are separated by a space, as tokens of one text would be
+    return ''.join(
+        part if not part or part[-1].isspace() or index == len(parts) - 1 else part + ' '
+        for index, part in enumerate(parts)
+    )
+
+def _csv_chunks(file_path: str, columns: Optional[List[str]]) -> Iterator[tuple]:
+    # Yield (index, chunk, columns to process) for chunks of CSV rows. The
+    # columns (default: the text columns) are chosen once from the first
+    # chunk, as a text column that is empty in a later chunk reads as numbers
+    selected = None
+    for index, df in enumerate(pd.read_csv(file_path, chunksize=_CSV_CHUNK_ROWS)):
+        if selected is None:
+            selected = columns or list(df.select_dtypes(include='object').columns)
+            missing = [column for column in selected if column not in df.columns]
+            if missing:
+                raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        yield index, df, selected
+
+def transform_file(
+    file_path: str,
+    steps: List[tuple],
+    columns: Optional[List[str]] = None
+) -> str:
+    """Apply (name, op, params) text ops in order to a file and return the result
+
+    Text files are transformed a chunk of lines at a time. CSV files are read
+    a chunk of rows at a time and transformed cell by cell in the selected
+    columns (default: all text columns), and the result is CSV.
+    """
+    if not file_path.endswith('.csv'):
+        parts = []
+        for text in iter_chunks(file_path):
+            for name, op, params in steps:
+                with metrics.span("transform", "text", name):
+                    text = op(text, **params)
+            parts.append(text)
+        return _join_chunks(parts)
+
+    parts = []
+    for index, df, selected in _csv_chunks(file_path, columns):
+        for column in selected:
+            series = df[column].fillna('').astype(str)
+            for name, op, params in steps:
+                with metrics.span("transform", "text", name):
+                    series = series.map(lambda cell: op(cell, **params))
+            df[column] = series
+        with metrics.span("serialize", "text"):
+            parts.append(df.to_csv(index=False, header=index == 0))
+    return ''.join(parts)
+
+def _process_text(file_path: str, techniques: List[str], params: Dict[str, dict]) -> Dict[str, str]:
+    parts = {technique: [] for technique in techniques}
+    for chunk in iter_chunks(file_path):
+        for technique, processed in _apply(chunk, techniques, params).items():
+            parts[technique].append(processed)
+    # Token outputs are space separated; the others keep their own line breaks
+    return {
+        technique: (' ' if technique in TOKEN_OPS else '').join(p for p in chunks if p)
+        for technique, chunks in parts.items()
+    }
+
+def _process_csv(
+    file_path: str,
+    techniques: List[str],
+    params: Dict[str, dict],
+    columns: Optional[List[str]]
+) -> Dict[str, str]:
+    # Process the cells of the selected columns (default: all text columns)
+    # and return each technique's result as CSV
+    parts = {technique: [] for technique in techniques}
+    for index, df, selected in _csv_chunks(file_path, columns):
+        outputs = {technique: df.copy() for technique in techniques}
+        for column in selected:
+            processed = _apply_series(df[column].fillna('').astype(str), techniques, params)
+            for technique, out in outputs.items():
+                out[column] = processed[technique]
+        for technique, out in outputs.items():
+            with metrics.span("serialize", "text", technique):
+                parts[technique].append(out.to_csv(index=False, header=index == 0))
+    return {technique: ''.join(chunks) for technique, chunks in parts.items()}
+
+def process(
+    file_path: str,
+    techniques: List[str],
+    params: Optional[Dict[str, dict]] = None,
+    columns: Optional[List[str]] = None
+) -> dict:
+    """Apply preprocessing techniques to the text, a chunk at a time"""
+    results = {}
+    params = params or {}
     
     try:
-        # Read the text file
+        for technique in techniques:
+            if technique not in OPS:
+                raise ValueError(f"Unknown technique: {technique}")
+        
         if file_path.endswith('.csv'):
-            df = pd.read_csv(file_path)
-            text = df.to_string()
+            results = _process_csv(file_path, techniques, params, columns)
         else:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-        
-        for technique in techniques:
-            if technique == "lowercase":
-                results[technique] = text.lower()
-            
-            elif technique == "remove_punctuation":
-                translator = str.maketrans('', '', string.punctuation)
-                results[technique] = text.translate(translator)
-            
-            elif technique == "tokenize":
-                tokens = word_tokenize(text)
-                results[technique] = ' '.join(tokens)
-            
-            elif technique == "remove_stopwords":
-                stop_words = set(stopwords.words('english'))
-                tokens = word_tokenize(text.lower())
-                filtered_text = [word for word in tokens if word not in stop_words]
-                results[technique] = ' '.join(filtered_text)
+            results = _process_text(file_path, techniques, params)
                 
     except Exception as e:
         results["error"] = str(e)
     
-    return results 
\ No newline at end of file
+    return results 
@@ -0,0 +1,137 @@
+import weakref
+from typing import List, Tuple
+
+import librosa
+import numpy as np
+import scipy.fft
+
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# Periodic Hann window, as used by librosa
+_WINDOW = np.hanning(N_FFT + 1)[:-1].astype(np.float32)
+# Expected phase advance per hop for each frequency bin
+PHASE_ADVANCE = np.linspace(0, np.pi * HOP_LENGTH, N_FFT // 2 + 1, dtype=np.float32)
+
+# Spectra of recently seen read-only (i.e. cached) waveforms, so every op
+# applied to the same input reuses a single STFT
+_recent: List[Tuple[weakref.ref, np.ndarray]] = []
+_RECENT_SIZE = 2
+
+
+def stft(audio: np.ndarray) -> np.ndarray:
+    """Return the complex spectrum (bins x frames) of a mono waveform"""
+    shared = not audio.flags.writeable
+    if shared:
+        for ref, spectrum in _recent:
+            if ref() is audio:
+                return spectrum
+
+    padded = np.pad(np.asarray(audio, dtype=np.float32), N_FFT // 2)
+    spectrum = analyze(padded)
+
+    if shared:
+        spectrum.flags.writeable = False
+        _recent.insert(0, (weakref.ref(audio), spectrum))
+        del _recent[_RECENT_SIZE:]
+    return spectrum
+
+
+def analyze(signal: np.ndarray) -> np.ndarray:
+    """Return the spectra (bins x frames) of every whole frame of an already padded signal"""
+    frames = np.lib.stride_tricks.sliding_window_view(signal, N_FFT)[::HOP_LENGTH]
+    # scipy.fft keeps float32 input in single precision, unlike np.fft
+    return scipy.fft.rfft(frames * _WINDOW, axis=1).T
+
+
+def overlap_add(spectrum: np.ndarray, signal: np.ndarray, envelope: np.ndarray) -> None:
+    """Add the windowed frames of spectrum, starting at signal[0], to signal
+
+    The squared window is added to envelope; signal / envelope is the
+    reconstruction. Both need room for (frames - 1) * HOP_LENGTH + N_FFT samples.
+    """
+    frames = scipy.fft.irfft(spectrum.T, n=N_FFT, axis=1) * _WINDOW
+    overlap = N_FFT // HOP_LENGTH
+    window_sq = _WINDOW ** 2
+    # Every overlap-th frame tiles the signal without overlapping, so each
+    # group is added with one vectorized slice instead of a loop over frames
+    for offset in range(overlap):
+        group = frames[offset::overlap]
+        start = offset * HOP_LENGTH
+        end = start + group.size
+        signal[start:end] += group.reshape(-1)
+        envelope[start:end] += np.tile(window_sq, len(group))
+
+
+def normalize_envelope(signal: np.ndarray, envelope: np.ndarray) -> np.ndarray:
+    nonzero = envelope > np.finfo(np.float32).tiny
+    signal[nonzero] /= envelope[nonzero]
+    return signal
+
+
+def istft(spectrum: np.ndarray, length: int) -> np.ndarray:
+    """Invert stft() with windowed overlap-add, returning exactly length samples"""
+    signal = np.zeros(spectrum.shape[1] * HOP_LENGTH + N_FFT, dtype=np.float32)
+    envelope = np.zeros_like(signal)
+    overlap_add(spectrum, signal, envelope)
+    signal = normalize_envelope(signal, envelope)[N_FFT // 2:N_FFT // 2 + length]
+    return librosa.util.fix_length(signal, size=length)
+
+
+def vocode(frames: np.ndarray, steps: np.ndarray, phase: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Interpolate frames at the fractional frame positions steps
+
+    frames must include the frame after the last step. phase is the (float64)
+    phase of the first output frame; the phase of the step after the last one
+    is returned with the output, so a stream can be vocoded in pieces.
+    """
+    index = steps.astype(int)
+    alpha = (steps - index).astype(np.float32)[np.newaxis, :]
+    mags = np.abs(frames)
+    angles = np.angle(frames)
+
+    mag = (1 - alpha) * mags[:, index] + alpha * mags[:, index + 1]
+    # Phase increments between neighbouring frames, wrapped to [-pi, pi]
+    dphase = angles[:, index + 1] - angles[:, index] - PHASE_ADVANCE[:, np.newaxis]
+    dphase -= 2.0 * np.pi * np.round(dphase / (2.0 * np.pi))
+    # Accumulate in double precision so the phase does not drift over long inputs
+    phases = np.empty((dphase.shape[0], dphase.shape[1] + 1), dtype=np.float64)
+    phases[:, 0] = phase
+    np.cumsum(PHASE_ADVANCE[:, np.newaxis] + dphase, axis=1, out=phases[:, 1:])
+    phases[:, 1:] += phases[:, :1]
+    phase32 = phases[:, :-1].astype(np.float32)
+
+    stretched = np.empty(phase32.shape, dtype=np.complex64)
+    stretched.real = mag * np.cos(phase32)
+    stretched.imag = mag * np.sin(phase32)
+    return stretched, phases[:, -1]
+
+
+def phase_vocoder(spectrum: np.ndarray, rate: float) -> np.ndarray:
+    """Time-stretch a spectrum by rate (> 1 is faster)"""
+    steps = np.arange(0, spectrum.shape[1], rate)
+    padded = np.pad(spectrum, [(0, 0), (0, 2)])
+    stretched, _ = vocode(padded, steps, np.angle(spectrum[:, 0]).astype(np.float64))
+    return stretched
+
+
+def time_stretch(audio: np.ndarray, rate: float) -> np.ndarray:
+    length = int(round(len(audio) / rate))
+    return istft(phase_vocoder(stft(audio), rate), length)
+
+
+def pitch_shift(audio: np.ndarray, sr: int, n_steps: float) -> np.ndarray:
+    # Stretch in time, then resample back to the original duration
+    rate = 2.0 ** (-n_steps / 12)
+    stretched = time_stretch(audio, rate)
+    shifted = librosa.resample(stretched, orig_sr=sr / rate, target_sr=sr, res_type="soxr_hq")
+    return librosa.util.fix_length(shifted, size=len(audio))
+
+
+def spectral_subtraction(audio: np.ndarray, noise_frames: int) -> np.ndarray:
+    """Subtract the mean magnitude of the first noise_frames frames, keeping the phase"""
+    spectrum = stft(audio)
+    mag = np.abs(spectrum)
+    noise_mag = np.mean(mag[:, :noise_frames], axis=1, keepdims=True)
+    gain = np.maximum(mag - noise_mag, 0) / np.maximum(mag, np.finfo(np.float32).tiny)
+    return istft(spectrum * gain, len(audio))
@@ -25,7 +25,7 @@ document.addEventListener('DOMContentLoaded', function() {
         formData.append('file', file);
 
         try {
-            const response = await fetch('/upload/', {
+            const response = await fetch('/upload/?format=binary', {
                 method: 'POST',
                 body: formData
             });
@@ -41,45 +41,36 @@ document.addEventListener('DOMContentLoaded', function() {
             currentFileType = data.file_type;
             originalPreview = data.preview;
 
+            if (data.preview_url) {
+                // 3D geometry is fetched separately as a binary mesh payload
+                const previewResponse = await fetch(data.preview_url);
+                const contentType = previewResponse.headers.get('Content-Type') || '';
+                if (contentType.startsWith(MESH_MEDIA_TYPE)) {
+                    const pack = decodeMeshPack(await previewResponse.arrayBuffer());
+                    originalPreview = { ...pack.meshes.preview, stats: pack.meta.stats };
+                } else {
+                    originalPreview = (await previewResponse.json()).preview;
+                }
+            }
+
             // Show preview
             previewSection.classList.remove('hidden');
             const previewElement = document.getElementById('preview');
             
             if (currentFileType === 'image') {
-                previewElement.innerHTML = `<img src="data:image/png;base64,${data.preview}" class="max-w-full h-auto" />`;
-            } else if (currentFileType === 'text') {
+                previewElement.innerHTML = `<img src="data:image/jpeg;base64,${data.preview}" class="max-w-full h-auto" />`;
+            } else if (currentFileType === 'text' || currentFileType === 'archive') {
                 previewElement.innerHTML = `<pre class="whitespace-pre-wrap">${data.preview}</pre>`;
             } else if (currentFileType === 'audio') {
                 previewElement.innerHTML = `<audio controls src="data:audio/wav;base64,${data.preview}"></audio>`;
             } else if (currentFileType === '3d') {
                 try {
-                    const previewData = JSON.parse(data.preview);
-                    previewElement.innerHTML = `
-                        <div id="preview-container" class="w-full h-[400px]"></div>
-                        <details class="mt-2">
-                            <summary class="cursor-pointer text-sm text-gray-600">Show Details</summary>
-                            <pre class="text-xs mt-2">${JSON.stringify(previewData.stats, null, 2)}</pre>
-                        </details>
-                    `;
-                    
-                    // Initialize 3D viewer after the element is added to DOM
-                    setTimeout(() => {
-                        const viewerData = init3DViewer('preview-container', {
-                            vertices: previewData.vertices,
-                            faces: previewData.faces
-                        });
-                        if (viewerData) {
-                            previewRenderer = viewerData.renderer;
-                            previewScene = viewerData.scene;
-                            previewCamera = viewerData.camera;
-                            previewControls = viewerData.controls;
-                        }
-                    }, 0);
+                    show3DPreview(previewElement, originalPreview);
                 } catch (error) {
                     console.error('Error parsing 3D preview data:', error);
                     previewElement.innerHTML = `
                         <div class="text-red-500">Error displaying 3D model</div>
-                        <pre class="text-xs mt-2">${data.preview}</pre>
+                        <pre class="text-xs mt-2">${originalPreview}</pre>
                     `;
                 }
             }
@@ -103,6 +94,96 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    const MESH_MEDIA_TYPE = 'application/x-mesh-pack';
+
+    // Decode a binary mesh payload (layout documented in app/mesh_codec.py)
+    function decodeMeshPack(buffer) {
+        const headerLength = new DataView(buffer).getUint32(4, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+        const dataStart = 8 + headerLength;
+        const meshes = {};
+        Object.entries(header.meshes).forEach(([name, entry]) => {
+            meshes[name] = {
+                vertices: new Float32Array(buffer, dataStart + entry.vertex_offset, entry.n_vertices * 3),
+                faces: new Uint32Array(buffer, dataStart + entry.face_offset, entry.n_faces * 3)
+            };
+        });
+        return { meshes, meta: header.meta };
+    }
+
+    // Encode a single mesh as a base64 mesh payload to send back for augmentation
+    function encodeMeshPack(mesh) {
+        const header = new TextEncoder().encode(JSON.stringify({
+            meshes: {
+                mesh: {
+                    n_vertices: mesh.vertices.length / 3,
+                    n_faces: mesh.faces.length / 3,
+                    vertex_offset: 0,
+                    face_offset: mesh.vertices.byteLength
+                }
+            },
+            meta: {}
+        }));
+        const headerLength = (header.length + 3) & ~3;
+        const dataStart = 8 + headerLength;
+        const bytes = new Uint8Array(dataStart + mesh.vertices.byteLength + mesh.faces.byteLength);
+        bytes.set([77, 83, 72, 80]);  // "MSHP"
+        new DataView(bytes.buffer).setUint32(4, headerLength, true);
+        bytes.fill(32, 8, dataStart);
+        bytes.set(header, 8);
+        bytes.set(new Uint8Array(mesh.vertices.buffer, mesh.vertices.byteOffset, mesh.vertices.byteLength), dataStart);
+        bytes.set(new Uint8Array(mesh.faces.buffer, mesh.faces.byteOffset, mesh.faces.byteLength),
+                  dataStart + mesh.vertices.byteLength);
+
+        // btoa needs a binary string; build it in chunks to stay under argument limits
+        let binary = '';
+        for (let i = 0; i < bytes.length; i += 0x8000) {
+            binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+        }
+        return btoa(binary);
+    }
+
+    // Results are either artifact URLs served by the API or inline base64
+    function mediaSrc(result, mimeType) {
+        return result.startsWith('/artifacts/') ? result : `data:${mimeType};base64,${result}`;
+    }
+
+    // Read a results response, decoding binary mesh payloads for 3D
+    async function readResults(response) {
+        const contentType = response.headers.get('Content-Type') || '';
+        if (contentType.startsWith(MESH_MEDIA_TYPE)) {
+            return decodeMeshPack(await response.arrayBuffer()).meshes;
+        }
+        return await response.json();
+    }
+
+    function show3DPreview(previewElement, previewData) {
+        if (typeof previewData === 'string') {
+            previewData = JSON.parse(previewData);
+        }
+        previewElement.innerHTML = `
+            <div id="preview-container" class="w-full h-[400px]"></div>
+            <details class="mt-2">
+                <summary class="cursor-pointer text-sm text-gray-600">Show Details</summary>
+                <pre class="text-xs mt-2">${JSON.stringify(previewData.stats, null, 2)}</pre>
+            </details>
+        `;
+        
+        // Initialize 3D viewer after the element is added to DOM
+        setTimeout(() => {
+            const viewerData = init3DViewer('preview-container', {
+                vertices: previewData.vertices,
+                faces: previewData.faces
+            });
+            if (viewerData) {
+                previewRenderer = viewerData.renderer;
+                previewScene = viewerData.scene;
+                previewCamera = viewerData.camera;
+                previewControls = viewerData.controls;
+            }
+        }, 0);
+    }
+
     function showProcessingOptions(fileType) {
         // Show both preview and results sections
         previewSection.classList.remove('hidden');
@@ -187,7 +268,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 return [
                     { value: 'flip', label: 'Flip' },
                     { value: 'rotate', label: 'Rotate' },
-                    { value: 'noise', label: 'Add Noise' }
+                    { value: 'noise', label: 'Add Noise' },
+                    { value: 'random', label: 'Random Flip/Rotate/Jitter' }
                 ];
             case 'text':
                 return [
@@ -222,7 +304,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         try {
-            const response = await fetch(`/preprocess/${currentFileType}`, {
+            const response = await fetch(`/preprocess/${currentFileType}?format=binary&output=artifact`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -233,7 +315,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 })
             });
 
-            const results = await response.json();
+            const results = await readResults(response);
             if (results.error) {
                 alert(results.error);
                 return;
@@ -256,7 +338,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         try {
-            const response = await fetch(`/augment/${currentFileType}`, {
+            const response = await fetch(`/augment/${currentFileType}?format=binary&output=artifact`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -268,7 +350,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 })
             });
 
-            const results = await response.json();
+            const results = await readResults(response);
             if (results.error) {
                 alert(results.error);
                 return;
@@ -280,6 +362,41 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // Pipeline button click handler: chains the selected preprocessing and
+    // augmentation steps in one request, decoding and encoding only once
+    document.getElementById('pipelineBtn').addEventListener('click', async function() {
+        const steps = Array.from(document.querySelectorAll('.processing-option:checked, .augmentation-option:checked'))
+            .map(option => ({ op: option.value }));
+
+        if (steps.length === 0) {
+            alert('Please select at least one processing or augmentation option');
+            return;
+        }
+
+        try {
+            const response = await fetch(`/pipeline/${currentFileType}?format=binary&output=artifact`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    filename: currentFile,
+                    steps: steps
+                })
+            });
+
+            const results = await readResults(response);
+            if (results.error) {
+                alert(results.error);
+                return;
+            }
+            displayResults(results, 'Pipeline');
+        } catch (error) {
+            console.error('Error:', error);
+            alert('An error occurred while running the pipeline');
+        }
+    });
+
     function displayResults(results, prefix) {
         resultsSection.classList.remove('hidden');
         const resultsContainer = document.getElementById('results');
@@ -292,7 +409,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (currentFileType === 'image') {
                 resultElement.innerHTML = `
                     <h3 class="font-semibold mb-2">${prefix} - ${technique}</h3>
-                    <img src="data:image/png;base64,${result}" class="max-w-full h-auto mb-2" />
+                    <img src="${mediaSrc(result, 'image/png')}" loading="lazy" class="max-w-full h-auto mb-2" />
                     <div class="mt-4">
                         <button class="use-for-augmentation bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600"
                                 data-result="${result}" data-type="image">
@@ -314,7 +431,7 @@ document.addEventListener('DOMContentLoaded', function() {
             } else if (currentFileType === 'audio') {
                 resultElement.innerHTML = `
                     <h3 class="font-semibold mb-2">${prefix} - ${technique}</h3>
-                    <audio controls src="data:audio/wav;base64,${result}" class="mb-2"></audio>
+                    <audio controls preload="none" src="${mediaSrc(result, 'audio/wav')}" class="mb-2"></audio>
                     <div class="mt-4">
                         <button class="use-for-augmentation bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600"
                                 data-result="${result}" data-type="audio">
@@ -324,17 +441,21 @@ document.addEventListener('DOMContentLoaded', function() {
                 `;
             } else if (currentFileType === '3d') {
                 try {
-                    const meshData = JSON.parse(result);
+                    const meshData = typeof result === 'string' ? JSON.parse(result) : result;
+                    const meshStats = {
+                        n_vertices: meshData.vertices.length / (meshData.vertices instanceof Float32Array ? 3 : 1),
+                        n_faces: meshData.faces.length / (meshData.faces instanceof Uint32Array ? 3 : 1)
+                    };
                     resultElement.innerHTML = `
                         <h3 class="font-semibold mb-2">${prefix} - ${technique}</h3>
                         <div id="result-${technique}" class="w-full h-[400px]"></div>
                         <details class="mt-2 mb-2">
                             <summary class="cursor-pointer text-sm text-gray-600">Show Details</summary>
-                            <pre class="text-xs mt-2">${JSON.stringify(meshData, null, 2)}</pre>
+                            <pre class="text-xs mt-2">${JSON.stringify(meshStats, null, 2)}</pre>
                         </details>
                         <div class="mt-4">
                             <button class="use-for-augmentation bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600"
-                                    data-result="${encodeURIComponent(result)}" data-type="3d">
+                                    data-type="3d">
                                 Use for Augmentation
                             </button>
                         </div>
@@ -362,8 +483,11 @@ document.addEventListener('DOMContentLoaded', function() {
 
             // Add click handler for the "Use for Augmentation" button
             resultElement.querySelector('.use-for-augmentation')?.addEventListener('click', function() {
-                const resultData = this.getAttribute('data-result');
                 const resultType = this.getAttribute('data-type');
+                // Meshes are kept as typed arrays and only encoded when selected
+                const resultData = resultType === '3d'
+                    ? (typeof result === 'string' ? encodeURIComponent(result) : encodeMeshPack(result))
+                    : this.getAttribute('data-result');
                 
                 // Store the selected preprocessed result
                 currentPreprocessedResult = resultData;
@@ -399,7 +523,7 @@ document.addEventListener('DOMContentLoaded', function() {
                             </div>
                         </div>
                         <div class="flex justify-center">
-                            <img src="data:image/png;base64,${resultData}" class="max-w-full h-auto rounded shadow-lg" />
+                            <img src="${mediaSrc(resultData, 'image/png')}" class="max-w-full h-auto rounded shadow-lg" />
                         </div>
                     `;
                 } else if (resultType === 'text') {
@@ -432,10 +556,10 @@ document.addEventListener('DOMContentLoaded', function() {
                                 </div>
                             </div>
                         </div>
-                        <audio controls src="data:audio/wav;base64,${resultData}"></audio>
+                        <audio controls src="${mediaSrc(resultData, 'audio/wav')}"></audio>
                     `;
                 } else if (resultType === '3d') {
-                    const meshData = JSON.parse(decodeURIComponent(resultData));
+                    const meshData = typeof result === 'string' ? JSON.parse(result) : result;
                     previewElement.innerHTML = `
                         <div class="bg-blue-50 border-l-4 border-blue-500 p-4 mb-4">
                             <div class="flex items-center">
@@ -478,7 +602,6 @@ document.addEventListener('DOMContentLoaded', function() {
     function init3DViewer(containerId, data) {
         try {
             console.log('Initializing 3D viewer for', containerId);
-            console.log('Data:', data);
             
             const container = document.getElementById(containerId);
             if (!container) {
@@ -516,12 +639,16 @@ document.addEventListener('DOMContentLoaded', function() {
             // Create geometry from the data
             const geometry = new THREE.BufferGeometry();
             
-            // Convert vertices array to Float32Array
-            const vertices = new Float32Array(data.vertices.flat());
+            // Binary payloads arrive as flat typed arrays; JSON as nested arrays
+            const vertices = data.vertices instanceof Float32Array
+                ? data.vertices
+                : new Float32Array(data.vertices.flat());
             geometry.setAttribute('position', new THREE.BufferAttribute(vertices, 3));
 
-            // Convert faces array to Uint16Array for indices
-            const indices = new Uint16Array(data.faces.flat());
+            // Uint32 indices so meshes with more than 65535 vertices render correctly
+            const indices = data.faces instanceof Uint32Array
+                ? data.faces
+                : new Uint32Array(data.faces.flat());
             geometry.setIndex(new THREE.BufferAttribute(indices, 1));
 
             // Calculate normals
@@ -609,34 +736,14 @@ document.addEventListener('DOMContentLoaded', function() {
         
         const previewElement = document.getElementById('preview');
         if (currentFileType === 'image') {
-            previewElement.innerHTML = `<img src="data:image/png;base64,${originalPreview}" class="max-w-full h-auto" />`;
+            previewElement.innerHTML = `<img src="data:image/jpeg;base64,${originalPreview}" class="max-w-full h-auto" />`;
         } else if (currentFileType === 'text') {
             previewElement.innerHTML = `<pre class="whitespace-pre-wrap">${originalPreview}</pre>`;
         } else if (currentFileType === 'audio') {
             previewElement.innerHTML = `<audio controls src="data:audio/wav;base64,${originalPreview}"></audio>`;
         } else if (currentFileType === '3d') {
             try {
-                const previewData = JSON.parse(originalPreview);
-                previewElement.innerHTML = `
-                    <div id="preview-container" class="w-full h-[400px]"></div>
-                    <details class="mt-2">
-                        <summary class="cursor-pointer text-sm text-gray-600">Show Details</summary>
-                        <pre class="text-xs mt-2">${JSON.stringify(previewData.stats, null, 2)}</pre>
-                    </details>
-                `;
-                
-                setTimeout(() => {
-                    const viewerData = init3DViewer('preview-container', {
-                        vertices: previewData.vertices,
-                        faces: previewData.faces
-                    });
-                    if (viewerData) {
-                        previewRenderer = viewerData.renderer;
-                        previewScene = viewerData.scene;
-                        previewCamera = viewerData.camera;
-                        previewControls = viewerData.controls;
-                    }
-                }, 0);
+                show3DPreview(previewElement, originalPreview);
             } catch (error) {
                 console.error('Error resetting 3D preview:', error);
             }
@@ -0,0 +1,379 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+from . import cache, config, mesh_lod, mesh_store
+
+_CHUNK_SIZE = 1 << 20
+
+# Uploads are issued ids that keep the file extension
+_ID_RE = re.compile(r"^[0-9a-f]{32}\.[a-z0-9]+$")
+# Accesses are written to the index at most once per interval and file
+TOUCH_INTERVAL = 60.0
+# Unindexed files younger than this may belong to uploads still being stored
+_ORPHAN_AGE = 3600.0
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+# Content is stored once, as <SHA-256>.<extension>, whichever uploads refer to it
+_BLOB_RE = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS uploads (
+        id TEXT PRIMARY KEY,
+        original_name TEXT NOT NULL,
+        file_type TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        created REAL NOT NULL,
+        last_access REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS uploads_last_access ON uploads (last_access)",
+    "CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads (sha256)"
+)
+_COLUMNS = ("id", "original_name", "file_type", "size", "sha256", "created", "last_access")
+
+# One index connection per thread
+_local = threading.local()
+
+FILE_TYPES = {
+    'txt': "text", 'csv': "text",
+    'jpg': "image", 'jpeg': "image", 'png': "image",
+    'wav': "audio", 'mp3': "audio",
+    'obj': "3d", 'stl': "3d", 'off': "3d", 'ply': "3d"
+}
+
+
+def file_type_for(filename: str) -> Optional[str]:
+    """Return the modality of a file from its extension, or None if unsupported"""
+    return FILE_TYPES.get(filename.split('.')[-1].lower())
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+def spool_upload(src: BinaryIO, dest_dir: str, max_bytes: int = None) -> Tuple[str, str]:
+    """Stream src in chunks to a temp file in dest_dir and return (temp path, SHA-256)
+
+    The caller renames the temp file into place, so readers never see a
+    partial upload, or removes it.
+    """
+    max_bytes = config.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        src.seek(0)
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def is_valid_id(file_id: str) -> bool:
+    return bool(_ID_RE.match(file_id))
+
+
+def _extension(file_id: str) -> str:
+    return file_id.rsplit(".", 1)[1]
+
+
+def blob_path(sha256: str, ext: str) -> str:
+    """Return the path of the stored content with a digest and file extension
+
+    Uploads of identical bytes share one blob; the extension is kept, as
+    decoders tell some formats apart by it.
+    """
+    return os.path.join(config.UPLOAD_DIR, f"{sha256}.{ext}")
+
+
+def _index() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.UPLOAD_INDEX_PATH) or ".", exist_ok=True)
+        # Autocommit, so every statement is its own transaction; SQLite
+        # serializes writers across processes and waits up to timeout for locks
+        conn = sqlite3.connect(config.UPLOAD_INDEX_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        _local.conn = conn
+    return conn
+
+
+@contextlib.contextmanager
+def _transaction() -> Iterator[sqlite3.Connection]:
+    # Holds the index's write lock, so adding and dropping references to a
+    # blob, and writing or removing it, happen in one step across processes
+    conn = _index()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _references(conn: sqlite3.Connection, sha256: str, ext: str) -> int:
+    # Uploads whose content is the blob of sha256 and ext
+    return conn.execute(
+        "SELECT COUNT(*) FROM uploads WHERE sha256 = ? AND id LIKE ?", (sha256, f"%.{ext}")
+    ).fetchone()[0]
+
+
+def store_upload(src: BinaryIO, filename: str, file_type: str, max_bytes: int = None) -> Tuple[str, str, str]:
+    """Save an upload under a new id, index it and return (id, SHA-256, path)
+
+    Content already stored is not written again; the new id refers to the
+    existing blob.
+    """
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    ext = filename.split('.')[-1].lower()
+    file_id = f"{uuid.uuid4().hex}.{ext}"
+    if not is_valid_id(file_id):
+        raise ValueError(f"Unsupported file name: {filename}")
+    tmp_path, digest = spool_upload(src, config.UPLOAD_DIR, max_bytes)
+    file_path = blob_path(digest, ext)
+    try:
+        with _transaction() as conn:
+            if os.path.exists(file_path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, file_path)
+            now = time.time()
+            conn.execute(
+                "INSERT INTO uploads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_id, os.path.basename(filename), file_type, os.path.getsize(file_path), digest, now, now)
+            )
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return file_id, digest, file_path
+
+
+def resolve(file_id: str) -> Optional[str]:
+    """Return the path of an upload and record the access, or None if it is unknown"""
+    if not is_valid_id(file_id):
+        return None
+    conn = _index()
+    now = time.time()
+    # Touch before checking, so an eviction that has not deleted the row yet skips it
+    conn.execute(
+        "UPDATE uploads SET last_access = ? WHERE id = ? AND last_access < ?",
+        (now, file_id, now - TOUCH_INTERVAL)
+    )
+    row = conn.execute("SELECT sha256 FROM uploads WHERE id = ?", (file_id,)).fetchone()
+    if row is None:
+        return None
+    file_path = blob_path(row[0], _extension(file_id))
+    return file_path if os.path.exists(file_path) else None
+
+
+def info(file_id: str) -> Optional[Dict[str, Any]]:
+    """Return the indexed metadata of an upload, or None if it is unknown"""
+    if not is_valid_id(file_id):
+        return None
+    row = _index().execute(f"SELECT {', '.join(_COLUMNS)} FROM uploads WHERE id = ?", (file_id,)).fetchone()
+    return dict(zip(_COLUMNS, row)) if row else None
+
+
+def _blob_for(file_path: str) -> Optional[Tuple[str, str]]:
+    # The (SHA-256, extension) of the blob at file_path, or None for other files
+    directory, name = os.path.split(os.path.abspath(file_path))
+    match = _BLOB_RE.match(name)
+    if directory != os.path.abspath(config.UPLOAD_DIR) or not match:
+        return None
+    return match.group(1), match.group(2)
+
+
+def touch(file_paths: Iterable[str]) -> None:
+    """Record that the uploads at file_paths are in use; other paths are ignored
+
+    Holders of upload paths that outlive TASK_TIMEOUT, such as batch jobs,
+    call this at least every TOUCH_INTERVAL seconds so evict() keeps them.
+    """
+    blobs = [blob for blob in map(_blob_for, file_paths) if blob]
+    conn = _index()
+    now = time.time()
+    for sha256, ext in blobs:
+        conn.execute(
+            "UPDATE uploads SET last_access = ? WHERE sha256 = ? AND id LIKE ?", (now, sha256, f"%.{ext}")
+        )
+
+
+def indexed_digest(file_path: str) -> Optional[str]:
+    """Return the SHA-256 of the upload content at file_path, or None for other files
+
+    Blobs are named by the digest computed while they were stored and are
+    never rewritten, so it holds for as long as they exist.
+    """
+    blob = _blob_for(file_path)
+    return blob[0] if blob else None
+
+
+def _remove_files(conn: sqlite3.Connection, file_id: str, sha256: str) -> Tuple[bool, bool]:
+    # Called in the transaction deleting the upload's row. Removes the blob
+    # with its last reference and the LOD pyramid with the last upload of its
+    # content, and returns whether each went
+    ext = _extension(file_id)
+    if _references(conn, sha256, ext):
+        return False, False
+    file_path = blob_path(sha256, ext)
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    cache.forget_digest(file_path)
+    # Arrays stored by mesh_store go with the mesh, and its LOD pyramid with
+    # the last upload of the same content
+    shutil.rmtree(mesh_store.store_path(file_path), ignore_errors=True)
+    if conn.execute("SELECT 1 FROM uploads WHERE sha256 = ?", (sha256,)).fetchone() is not None:
+        return True, False
+    try:
+        os.remove(mesh_lod.path_for_digest(sha256))
+    except FileNotFoundError:
+        pass
+    return True, True
+
+
+def delete(file_id: str) -> bool:
+    """Delete an upload; returns False if it is unknown
+
+    Its content is removed too unless another upload refers to it.
+    """
+    if not is_valid_id(file_id):
+        return False
+    with _transaction() as conn:
+        row = conn.execute("SELECT sha256 FROM uploads WHERE id = ?", (file_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM uploads WHERE id = ?", (file_id,))
+        _remove_files(conn, file_id, row[0])
+    return True
+
+
+def _file_bytes(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _disk_bytes(sha256: str, ext: str) -> int:
+    # A blob plus its mesh_store arrays, if any
+    file_path = blob_path(sha256, ext)
+    size = _file_bytes(file_path)
+    store_dir = mesh_store.store_path(file_path)
+    if os.path.isdir(store_dir):
+        size += sum(entry.stat().st_size for entry in os.scandir(store_dir) if entry.is_file())
+    return size
+
+
+def _remove_orphans(now: float) -> int:
+    # Files left by crashed uploads and builds, blobs and stores no upload
+    # refers to, files of the id-named layout and pyramids of content no upload
+    # has. Files not named like uploads are kept. Runs under the index write
+    # lock, so no upload starts referring to a blob while it is removed
+    with _transaction() as conn:
+        blobs = set()
+        digests = set()
+        for file_id, sha256 in conn.execute("SELECT id, sha256 FROM uploads"):
+            blobs.add(f"{sha256}.{_extension(file_id)}")
+            digests.add(sha256)
+        candidates = []
+        for entry in os.scandir(config.UPLOAD_DIR):
+            owner = entry.name
+            if owner.endswith(mesh_store.SUFFIX):
+                owner = owner[:-len(mesh_store.SUFFIX)]
+            orphaned = is_valid_id(owner) or (bool(_BLOB_RE.match(owner)) and owner not in blobs)
+            candidates.append((entry, entry.name.endswith(".part") or orphaned))
+        if os.path.isdir(config.LOD_DIR):
+            for entry in os.scandir(config.LOD_DIR):
+                digest = entry.name[:-len(mesh_lod.SUFFIX)]
+                pyramid = entry.name.endswith(mesh_lod.SUFFIX) and bool(_DIGEST_RE.match(digest))
+                candidates.append((entry, entry.name.endswith(".part") or (pyramid and digest not in digests)))
+        removed = 0
+        for entry, orphaned in candidates:
+            try:
+                if not orphaned or entry.stat().st_mtime > now - _ORPHAN_AGE:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+def evict(now: Optional[float] = None) -> Dict[str, int]:
+    """Delete uploads unused for UPLOAD_TTL, then least recently used ones over UPLOAD_QUOTA_BYTES
+
+    Uploads accessed within TASK_TIMEOUT plus TOUCH_INTERVAL may be in use by a
+    running task, whose access may not have been written, and are kept even
+    over the quota; longer holders keep theirs with touch(). Content shared by
+    several uploads counts once and is freed with the last of them. One
+    process evicts at a time; the others skip the run.
+    """
+    now = time.time() if now is None else now
+    counts = {"expired": 0, "evicted": 0, "orphans": 0}
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    with open(os.path.join(config.UPLOAD_DIR, ".evict.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return counts
+
+        rows = _index().execute("SELECT id, sha256, last_access FROM uploads ORDER BY last_access").fetchall()
+        # Blobs and pyramids are shared by uploads of the same content, so each counts once
+        usage = {}
+        pyramids = {}
+        for file_id, sha256, _ in rows:
+            blob = (sha256, _extension(file_id))
+            if blob not in usage:
+                usage[blob] = _disk_bytes(*blob)
+            if sha256 not in pyramids:
+                pyramids[sha256] = _file_bytes(mesh_lod.path_for_digest(sha256))
+        total = sum(usage.values()) + sum(pyramids.values())
+        in_use_since = now - (config.TASK_TIMEOUT + TOUCH_INTERVAL)
+        for file_id, sha256, last_access in rows:
+            expired = bool(config.UPLOAD_TTL) and last_access < now - config.UPLOAD_TTL
+            over_quota = bool(config.UPLOAD_QUOTA_BYTES) and total > config.UPLOAD_QUOTA_BYTES
+            # Rows are oldest first, so the rest are neither expired nor evictable
+            if last_access >= in_use_since or not (expired or over_quota):
+                break
+            with _transaction() as conn:
+                # Skipped if the upload was accessed since it was read above
+                deleted = conn.execute(
+                    "DELETE FROM uploads WHERE id = ? AND last_access = ?", (file_id, last_access)
+                ).rowcount
+                blob_freed, pyramid_freed = _remove_files(conn, file_id, sha256) if deleted else (False, False)
+            if deleted:
+                if blob_freed:
+                    total -= usage[(sha256, _extension(file_id))]
+                if pyramid_freed:
+                    total -= pyramids[sha256]
+                counts["expired" if expired else "evicted"] += 1
+        counts["orphans"] = _remove_orphans(now)
+    return counts
@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+
+
+def _warm_text() -> None:
+    from nltk.tokenize import word_tokenize
+    from .augmentation import text_augmentor
+    from .preprocessing import text_processor
+
+    word_tokenize("Warm up the tokenizer.")
+    text_processor._stopwords('english')
+    text_augmentor.synonym_index()
+
+
+def _warm_image() -> None:
+    from PIL import Image
+    from .augmentation import image_augmentor
+    from .preprocessing import image_processor
+
+    img = Image.new("RGB", (8, 8))
+    for op in (*image_processor.OPS.values(), *image_augmentor.OPS.values()):
+        op(img)
+
+
+def _warm_audio() -> None:
+    from .augmentation import audio_augmentor
+    from .preprocessing import audio_processor
+
+    # Runs every op once so librosa's numba-compiled paths are JIT-ed up front
+    sr = 22050
+    audio = np.random.default_rng(0).standard_normal(sr).astype(np.float32)
+    for op in (*audio_processor.OPS.values(), *audio_augmentor.OPS.values()):
+        op(audio, sr)
+
+
+def _warm_mesh() -> None:
+    import trimesh
+    from .augmentation import mesh_augmentor
+    from .preprocessing import mesh_processor
+
+    box = trimesh.creation.box()
+    for op in (*mesh_processor.OPS.values(), *mesh_augmentor.OPS.values()):
+        op(box.vertices.astype(np.float32), box.faces.astype(np.int32))
+
+
+def prepare() -> None:
+    """Build the files every worker loads while warming up, once, before the workers start
+
+    Otherwise each worker would build them in parallel on a cold start.
+    """
+    try:
+        from .augmentation import text_augmentor
+
+        text_augmentor.ensure_synonym_index_file()
+    except Exception as e:
+        print(f"Error preparing warm-up: {str(e).strip()}")
+
+
+def warm_up() -> float:
+    """Import every modality, preload corpora and run each op once; return the seconds taken"""
+    start = time.perf_counter()
+    for warm in (_warm_text, _warm_image, _warm_audio, _warm_mesh):
+        try:
+            warm()
+        except Exception as e:
+            # A missing corpus or optional dependency only affects that modality
+            print(f"Error in warm-up step {warm.__name__}: {str(e).strip()}")
+    return time.perf_counter() - start